@@ -1,21 +1,37 @@
-from flask import Flask, request, jsonify, session, send_from_directory
+from flask import Flask, Response, request, jsonify, session, send_from_directory
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import uuid
 import json
-import requests
-import jwt
 import os
 import logging
+import mimetypes
 from logging.handlers import RotatingFileHandler
-import psycopg
-from psycopg.rows import dict_row
-from werkzeug.security import generate_password_hash, check_password_hash
+from cache import TTLCache
+from db_pool import get_db_connection, release_db_connection, get_pool_stats
+from migrate import ensure_schema
+from job_queue import enqueue_execution
+from pagination import page_size, decode_cursor, split_page, paginated_response, CursorError
+from webhook_ingest import (
+    ingest_webhook_execution, new_execution_id, IngestUnavailable,
+    RETRY_AFTER_SECONDS, MAX_IDEMPOTENCY_KEY_LENGTH
+)
+from workflow_patch import build_patch, PatchError
+from workflow_engine import compile_plan, affects_plan, WorkflowGraphError
+from result_store import ZSTD, decode_payload
+from pi_client import pi_client, PiApiError
+from payments import record_created, request_completion
+from pi_tokens import verify_pi_token, token_verifier
+from passwords import hash_password, verify_password, hashing_pool, PasswordHashingBusy
+from precompressed import send_precompressed
+from static_assets import BUILD_DIR, SOURCE_DIR, ASSET_SOURCES, servable_files
+from tool_catalog import catalog as tool_catalog
 
 # Initialize Flask app
-app = Flask(__name__, static_folder='.', static_url_path='')
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-CORS(app, supports_credentials=True)
+# Cross-origin clients need X-Next-Cursor exposed to read pagination cursors
+CORS(app, supports_credentials=True, expose_headers=['X-Next-Cursor'])
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -23,126 +39,16 @@ handler = RotatingFileHandler('app.log', maxBytes=10000, backupCount=1)
 handler.setLevel(logging.INFO)
 app.logger.addHandler(handler)
 
-# Pi Network API configuration
-PI_API_URL = os.environ.get('PI_API_URL', 'https://api.minepi.com/v2')
-PI_API_KEY = os.environ.get('PI_API_KEY', 'your-pi-api-key')
+# Pi Network API configuration (API URL and key are read by pi_client)
 PI_SECRET_KEY = os.environ.get('PI_SECRET_KEY', 'your-pi-secret-key')
 
-# Database configuration
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        # For Neon DB or PostgreSQL with psycopg 3
-        conn = psycopg.connect(
-            host=os.environ.get('DB_HOST', 'localhost'),
-            dbname=os.environ.get('DB_NAME', 'pi_nocode_builder'),
-            user=os.environ.get('DB_USER', 'postgres'),
-            password=os.environ.get('DB_PASSWORD', 'password'),
-            port=os.environ.get('DB_PORT', '5432'),
-            row_factory=dict_row
-        )
-        return conn
-    except Exception as e:
-        app.logger.error(f"Database connection failed: {e}")
-        return None
-
-# Initialize database tables
-def init_db():
-    """Initialize database tables"""
-    conn = get_db_connection()
-    if not conn:
-        app.logger.error("Failed to initialize database")
-        return False
-    
-    try:
-        with conn.cursor() as cur:
-            # Users table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id SERIAL PRIMARY KEY,
-                    email VARCHAR(255) UNIQUE NOT NULL,
-                    password_hash VARCHAR(255),
-                    pi_uid VARCHAR(255),
-                    pi_username VARCHAR(255),
-                    pi_access_token TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP
-                )
-            """)
-            
-            # Workflows table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS workflows (
-                    id VARCHAR(255) PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id),
-                    name VARCHAR(255) NOT NULL,
-                    description TEXT,
-                    nodes JSONB,
-                    connections JSONB,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status VARCHAR(50) DEFAULT 'draft'
-                )
-            """)
-            
-            # Workflow executions table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS workflow_executions (
-                    id VARCHAR(255) PRIMARY KEY,
-                    workflow_id VARCHAR(255) REFERENCES workflows(id),
-                    status VARCHAR(50) NOT NULL,
-                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    completed_at TIMESTAMP,
-                    results JSONB,
-                    error_message TEXT
-                )
-            """)
-            
-            # API keys table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS api_keys (
-                    id SERIAL PRIMARY KEY,
-                    user_id INTEGER REFERENCES users(id),
-                    key VARCHAR(255) UNIQUE NOT NULL,
-                    name VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_used TIMESTAMP
-                )
-            """)
-            
-            conn.commit()
-            app.logger.info("Database initialized successfully")
-            return True
-            
-    except Exception as e:
-        app.logger.error(f"Database initialization failed: {e}")
-        conn.rollback()
-        return False
-    finally:
-        conn.close()
-
-# Initialize database on startup
-init_db()
-
 # Pi Network Integration Functions
 def verify_pi_access_token(access_token):
-    """Verify a Pi Network access token"""
-    try:
-        # In a real implementation, verify the JWT signature using Pi's public key
-        # This is a simplified version for demonstration
-        decoded = jwt.decode(access_token, options={"verify_signature": False})
-        return decoded
-    except Exception as e:
-        app.logger.error(f"Token verification failed: {e}")
-        return None
+    """Verify a Pi Network access token; returns its claims or None"""
+    return verify_pi_token(access_token)
 
 def create_pi_payment(amount, memo, metadata={}):
     """Create a payment through the Pi Network API"""
-    headers = {
-        'Authorization': f'Key {PI_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
     payload = {
         'amount': amount,
         'memo': memo,
@@ -151,34 +57,22 @@ def create_pi_payment(amount, memo, metadata={}):
     }
     
     try:
-        response = requests.post(f'{PI_API_URL}/payments', json=payload, headers=headers)
-        if response.status_code == 201:
-            return response.json()
-        else:
-            app.logger.error(f"Payment creation failed: {response.status_code} - {response.text}")
-            return None
-    except Exception as e:
-        app.logger.error(f"Payment API error: {e}")
+        return pi_client.create_payment(payload)
+    except PiApiError as e:
+        app.logger.error(f"Payment creation failed: {e} - {e.body}")
         return None
 
-def complete_pi_payment(payment_id, txid):
-    """Complete a Pi payment after it has been approved"""
-    headers = {
-        'Authorization': f'Key {PI_API_KEY}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        'txid': txid
-    }
-    
-    try:
-        response = requests.post(f'{PI_API_URL}/payments/{payment_id}/complete', 
-                               json=payload, headers=headers)
-        return response.status_code == 200
-    except Exception as e:
-        app.logger.error(f"Complete payment error: {e}")
-        return False
+# Cache of user ids already verified to exist, so steady-state authenticated
+# requests skip the users lookup
+authenticated_users = TTLCache(
+    maxsize=int(os.environ.get('AUTH_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('AUTH_CACHE_TTL', 60))
+)
+
+def invalidate_authenticated_user(user_id):
+    """Drop a user from the auth cache, e.g. after deleting the account"""
+    if user_id is not None:
+        authenticated_users.invalidate(user_id)
 
 # Authentication middleware
 def require_auth(f):
@@ -187,6 +81,9 @@ def require_auth(f):
         if 'user_id' not in session:
             return jsonify({'error': 'Authentication required'}), 401
         
+        if session['user_id'] in authenticated_users:
+            return f(*args, **kwargs)
+        
         # Verify session is still valid
         conn = get_db_connection()
         if not conn:
@@ -198,38 +95,78 @@ def require_auth(f):
                 user = cur.fetchone()
                 
                 if not user:
+                    invalidate_authenticated_user(session['user_id'])
                     session.clear()
                     return jsonify({'error': 'User not found'}), 401
+                
+                authenticated_users.set(user['id'], True)
         except Exception as e:
             app.logger.error(f"Auth verification failed: {e}")
             return jsonify({'error': 'Authentication verification failed'}), 500
         finally:
-            conn.close()
+            release_db_connection(conn)
             
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
 # Routes
+# Frontend assets come from `python static_assets.py build`. Hashed files are
+# cached for a year; index.html is revalidated so deploys take effect at once.
+# Without a build the unminified sources are served with short caching.
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 31536000))
+static_files = servable_files()
+
 @app.route('/')
 def serve_index():
     """Serve the main application"""
-    return send_from_directory('.', 'index.html')
+    response = send_precompressed(os.path.join(BUILD_DIR, 'index.html'), 'text/html')
+    if response is None:
+        response = send_from_directory(SOURCE_DIR, 'index.html', max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/static/<filename>')
+def serve_asset(filename):
+    """Serve a fingerprinted frontend asset"""
+    if filename not in static_files:
+        return jsonify({'error': 'Not found'}), 404
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_precompressed(os.path.join(BUILD_DIR, filename), mimetype,
+                                  max_age=STATIC_MAX_AGE, immutable=True)
+    if response is None:
+        return jsonify({'error': 'Not found'}), 404
+    return response
 
-@app.route('/<path:path>')
-def serve_static(path):
-    """Serve static files"""
-    return send_from_directory('.', path)
+@app.route('/<any({}):filename>'.format(', '.join(f'"{name}"' for name in ASSET_SOURCES)))
+def serve_source_asset(filename):
+    """Serve an unbuilt frontend asset for development"""
+    response = send_from_directory(SOURCE_DIR, filename, max_age=0)
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/health')
 def health_check():
     """Health check endpoint"""
+    conn = get_db_connection()
+    release_db_connection(conn)
     return jsonify({
         'status': 'healthy', 
         'timestamp': datetime.now().isoformat(),
-        'database': 'connected' if get_db_connection() else 'disconnected'
+        'database': 'connected' if conn else 'disconnected',
+        'pool': get_pool_stats(),
+        'auth_cache': authenticated_users.stats(),
+        'pi_api': pi_client.stats(),
+        'pi_tokens': token_verifier.stats(),
+        'password_hashing': hashing_pool.snapshot()
     })
 
+def hashing_busy_response():
+    """503 for auth requests shed because password hashing is saturated"""
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -243,6 +180,12 @@ def register():
     if len(password) < 8:
         return jsonify({'error': 'Password must be at least 8 characters'}), 400
     
+    # Hash before taking a database connection so none is held while waiting
+    try:
+        password_hash = hash_password(password)
+    except PasswordHashingBusy:
+        return hashing_busy_response()
+    
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -255,7 +198,6 @@ def register():
                 return jsonify({'error': 'User already exists'}), 409
             
             # Create new user
-            password_hash = generate_password_hash(password)
             cur.execute(
                 "INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING id",
                 (email, password_hash)
@@ -278,7 +220,7 @@ def register():
         conn.rollback()
         return jsonify({'error': 'Registration failed'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
@@ -297,16 +239,40 @@ def login():
     try:
         with conn.cursor() as cur:
             # Find user
-            cur.execute("SELECT * FROM users WHERE email = %s", (email,))
+            cur.execute(
+                "SELECT id, email, pi_username, password_hash FROM users WHERE email = %s",
+                (email,)
+            )
             user = cur.fetchone()
-            
-            if not user or not check_password_hash(user['password_hash'], password):
-                return jsonify({'error': 'Invalid credentials'}), 401
-            
-            # Update last login
+    except Exception as e:
+        app.logger.error(f"Login failed: {e}")
+        return jsonify({'error': 'Login failed'}), 500
+    finally:
+        release_db_connection(conn)
+    
+    # The connection is released while the password is checked
+    if not user:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    try:
+        matches, new_hash = verify_password(user['password_hash'], password)
+    except PasswordHashingBusy:
+        return hashing_busy_response()
+    if not matches:
+        return jsonify({'error': 'Invalid credentials'}), 401
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+        
+    try:
+        with conn.cursor() as cur:
+            # Update last login, upgrading the stored hash if its parameters are
+            # outdated and the password was not changed in the meantime
             cur.execute(
-                "UPDATE users SET last_login = %s WHERE id = %s",
-                (datetime.now(), user['id'])
+                """UPDATE users SET last_login = %s,
+                    password_hash = CASE WHEN password_hash = %s THEN COALESCE(%s, password_hash) ELSE password_hash END
+                WHERE id = %s""",
+                (datetime.now(), user['password_hash'], new_hash, user['id'])
             )
             conn.commit()
             
@@ -325,9 +291,10 @@ def login():
             
     except Exception as e:
         app.logger.error(f"Login failed: {e}")
+        conn.rollback()
         return jsonify({'error': 'Login failed'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/auth/pi', methods=['POST'])
 def pi_auth():
@@ -391,11 +358,12 @@ def pi_auth():
         conn.rollback()
         return jsonify({'error': 'Pi authentication failed'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
     """Logout the current user"""
+    invalidate_authenticated_user(session.get('user_id'))
     session.clear()
     return jsonify({'success': True, 'message': 'Logged out successfully'})
 
@@ -425,6 +393,7 @@ def auth_status():
                     }
                 })
             else:
+                invalidate_authenticated_user(session['user_id'])
                 session.clear()
                 return jsonify({'authenticated': False})
                 
@@ -432,7 +401,7 @@ def auth_status():
         app.logger.error(f"Auth status check failed: {e}")
         return jsonify({'authenticated': False})
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/pi/payment', methods=['POST'])
 @require_auth
@@ -468,6 +437,11 @@ def pi_payment():
             if not payment_data:
                 return jsonify({'error': 'Payment creation failed'}), 500
             
+            if payment_data.get('identifier'):
+                record_created(cur, payment_data['identifier'], session['user_id'], amount, memo,
+                               payment_data.get('metadata', {}))
+                conn.commit()
+            
             return jsonify({
                 'success': True,
                 'payment': payment_data
@@ -477,12 +451,12 @@ def pi_payment():
         app.logger.error(f"Payment creation failed: {e}")
         return jsonify({'error': 'Payment creation failed'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/pi/payment/complete', methods=['POST'])
 @require_auth
 def pi_payment_complete():
-    """Complete a Pi payment"""
+    """Queue a Pi payment for completion by the payment reconciler"""
     data = request.get_json()
     payment_id = data.get('payment_id')
     txid = data.get('txid')
@@ -490,18 +464,36 @@ def pi_payment_complete():
     if not payment_id or not txid:
         return jsonify({'error': 'Payment ID and TXID required'}), 400
     
-    # Complete the payment
-    success = complete_pi_payment(payment_id, txid)
-    
-    if not success:
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+        
+    try:
+        with conn.cursor() as cur:
+            payment = request_completion(cur, payment_id, session['user_id'], txid)
+            conn.commit()
+            
+            if not payment:
+                return jsonify({'error': 'Payment not found'}), 404
+            
+            # 202 while the reconciler still has to talk to the Pi API
+            return jsonify({
+                'success': payment['status'] != 'failed',
+                'payment_id': payment['id'],
+                'status': payment['status']
+            }), 200 if payment['status'] in ('completed', 'failed') else 202
+            
+    except Exception as e:
+        app.logger.error(f"Failed to queue payment completion: {e}")
+        conn.rollback()
         return jsonify({'error': 'Payment completion failed'}), 500
-    
-    return jsonify({'success': True})
+    finally:
+        release_db_connection(conn)
 
-@app.route('/api/workflows', methods=['GET'])
+@app.route('/api/pi/payment/<payment_id>', methods=['GET'])
 @require_auth
-def get_workflows():
-    """Get all workflows for the current user"""
+def get_pi_payment(payment_id):
+    """Get a payment's state from the ledger"""
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -509,18 +501,59 @@ def get_workflows():
     try:
         with conn.cursor() as cur:
             cur.execute(
-                "SELECT id, name, description, status, created_at, updated_at FROM workflows WHERE user_id = %s ORDER BY updated_at DESC",
-                (session['user_id'],)
+                """SELECT id, amount, memo, status, txid, last_error, created_at, updated_at, completed_at
+                FROM payments WHERE id = %s AND user_id = %s""",
+                (payment_id, session['user_id'])
             )
-            workflows = cur.fetchall()
+            payment = cur.fetchone()
             
-            return jsonify(workflows)
+            if not payment:
+                return jsonify({'error': 'Payment not found'}), 404
+            
+            if payment['amount'] is not None:
+                payment['amount'] = str(payment['amount'])
+            return jsonify(payment)
+            
+    except Exception as e:
+        app.logger.error(f"Failed to get payment: {e}")
+        return jsonify({'error': 'Failed to get payment'}), 500
+    finally:
+        release_db_connection(conn)
+
+@app.route('/api/workflows', methods=['GET'])
+@require_auth
+def get_workflows():
+    """Get workflows for the current user, one keyset page at a time"""
+    try:
+        limit = page_size(request.args)
+        after = decode_cursor(request.args.get('cursor'))
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+        
+    try:
+        with conn.cursor() as cur:
+            query = "SELECT id, name, description, status, created_at, updated_at FROM workflows WHERE user_id = %s"
+            params = [session['user_id']]
+            if after:
+                query += " AND (updated_at, id) < (%s, %s)"
+                params.extend(after)
+            query += " ORDER BY updated_at DESC, id DESC LIMIT %s"
+            params.append(limit + 1)
+            
+            cur.execute(query, params)
+            workflows, next_cursor = split_page(cur.fetchall(), limit, 'updated_at')
+            
+            return paginated_response(workflows, next_cursor)
             
     except Exception as e:
         app.logger.error(f"Failed to get workflows: {e}")
         return jsonify({'error': 'Failed to get workflows'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/workflows', methods=['POST'])
 @require_auth
@@ -539,9 +572,10 @@ def create_workflow():
     try:
         with conn.cursor() as cur:
             cur.execute(
-                """INSERT INTO workflows (id, user_id, name, description, nodes, connections) 
-                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id""",
-                (workflow_id, session['user_id'], name, description, json.dumps([]), json.dumps([]))
+                """INSERT INTO workflows (id, user_id, name, description, nodes, connections, execution_plan) 
+                VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
+                (workflow_id, session['user_id'], name, description, json.dumps([]), json.dumps([]),
+                 json.dumps(compile_plan([], [])))
             )
             workflow = cur.fetchone()
             conn.commit()
@@ -562,7 +596,7 @@ def create_workflow():
         conn.rollback()
         return jsonify({'error': 'Failed to create workflow'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/workflows/<workflow_id>', methods=['GET'])
 @require_auth
@@ -589,7 +623,7 @@ def get_workflow(workflow_id):
         app.logger.error(f"Failed to get workflow: {e}")
         return jsonify({'error': 'Failed to get workflow'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/workflows/<workflow_id>', methods=['PUT'])
 @require_auth
@@ -605,16 +639,29 @@ def update_workflow(workflow_id):
         with conn.cursor() as cur:
             # Verify the user owns this workflow
             cur.execute(
-                "SELECT id FROM workflows WHERE id = %s AND user_id = %s",
+                "SELECT id, nodes, connections FROM workflows WHERE id = %s AND user_id = %s",
                 (workflow_id, session['user_id'])
             )
-            if not cur.fetchone():
+            current = cur.fetchone()
+            if not current:
                 return jsonify({'error': 'Workflow not found'}), 404
             
             # Build update query based on provided fields
             update_fields = []
             update_values = []
             
+            # Graph changes are validated and compiled before anything is written
+            if 'nodes' in data or 'connections' in data:
+                try:
+                    plan = compile_plan(
+                        data.get('nodes', current['nodes']),
+                        data.get('connections', current['connections'])
+                    )
+                except WorkflowGraphError as e:
+                    return jsonify({'error': str(e)}), 422
+                update_fields.append("execution_plan = %s")
+                update_values.append(json.dumps(plan))
+            
             if 'name' in data:
                 update_fields.append("name = %s")
                 update_values.append(data['name'])
@@ -635,20 +682,28 @@ def update_workflow(workflow_id):
                 update_fields.append("status = %s")
                 update_values.append(data['status'])
             
-            # Always update the updated_at field
+            # Always update the updated_at field and bump the version
             update_fields.append("updated_at = %s")
             update_values.append(datetime.now())
+            update_fields.append("version = version + 1")
             
-            # Execute update
+            # Execute update, honouring an expected version when one is sent
+            where = "id = %s AND user_id = %s"
             update_values.append(workflow_id)
             update_values.append(session['user_id'])
+            if 'version' in data:
+                where += " AND version = %s"
+                update_values.append(data['version'])
             
             cur.execute(
-                f"UPDATE workflows SET {', '.join(update_fields)} WHERE id = %s AND user_id = %s RETURNING *",
+                f"UPDATE workflows SET {', '.join(update_fields)} WHERE {where} RETURNING *",
                 update_values
             )
             
             workflow = cur.fetchone()
+            if not workflow:
+                conn.rollback()
+                return jsonify({'error': 'Workflow was modified by another request'}), 409
             conn.commit()
             
             return jsonify(workflow)
@@ -658,7 +713,119 @@ def update_workflow(workflow_id):
         conn.rollback()
         return jsonify({'error': 'Failed to update workflow'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+def needs_replan(operations):
+    """Whether patch operations change anything the execution plan depends on"""
+    for op in operations:
+        if op.get('op') == 'set':
+            continue
+        if op.get('op') == 'update_node' and not affects_plan(op['changes']):
+            continue
+        return True
+    return False
+
+@app.route('/api/workflows/<workflow_id>', methods=['PATCH'])
+@require_auth
+def patch_workflow(workflow_id):
+    """Apply node and connection operations to a workflow
+
+    Expects {"version": n, "operations": [...]} where each operation is one of
+    update_node {id, changes}, add_node {node}, remove_node {id},
+    add_connection {connection}, remove_connection {id} or set {field, value}.
+    Only the touched nodes and connections are returned, with the new version.
+    """
+    data = request.get_json() or {}
+    expected_version = data.get('version')
+    if not isinstance(expected_version, int):
+        return jsonify({'error': 'version is required'}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+        
+    try:
+        with conn.cursor() as cur:
+            # Ids and connection ends only; the documents stay in Postgres
+            cur.execute(
+                """SELECT version,
+                       (SELECT COALESCE(jsonb_agg(v->>'id'), '[]'::jsonb)
+                        FROM jsonb_array_elements(COALESCE(nodes, '[]'::jsonb)) v) AS node_ids,
+                       (SELECT COALESCE(jsonb_object_agg(v->>'id', jsonb_build_array(v->>'sourceId', v->>'targetId')), '{}'::jsonb)
+                        FROM jsonb_array_elements(COALESCE(connections, '[]'::jsonb)) v) AS connection_ends
+                   FROM workflows WHERE id = %s AND user_id = %s""",
+                (workflow_id, session['user_id'])
+            )
+            current = cur.fetchone()
+            if not current:
+                return jsonify({'error': 'Workflow not found'}), 404
+            if current['version'] != expected_version:
+                return jsonify({'error': 'Workflow was modified by another request', 'version': current['version']}), 409
+            
+            try:
+                set_clauses, values, changes = build_patch(
+                    data.get('operations'), current['node_ids'], current['connection_ends']
+                )
+            except PatchError as e:
+                return jsonify({'error': str(e)}), 422
+            
+            set_clauses.append("updated_at = %s")
+            values.append(datetime.now())
+            set_clauses.append("version = version + 1")
+            
+            # The version check makes the read-validate-write sequence atomic
+            cur.execute(
+                f"""UPDATE workflows SET {', '.join(set_clauses)}
+                    WHERE id = %s AND user_id = %s AND version = %s
+                    RETURNING version, updated_at, name, description, status,
+                        (SELECT COALESCE(jsonb_agg(v), '[]'::jsonb) FROM jsonb_array_elements(nodes) v
+                         WHERE v->>'id' = ANY(%s)) AS nodes,
+                        (SELECT COALESCE(jsonb_agg(v), '[]'::jsonb) FROM jsonb_array_elements(connections) v
+                         WHERE v->>'id' = ANY(%s)) AS connections""",
+                values + [workflow_id, session['user_id'], expected_version, changes['nodes'], changes['connections']]
+            )
+            updated = cur.fetchone()
+            if not updated:
+                conn.rollback()
+                return jsonify({'error': 'Workflow was modified by another request'}), 409
+            
+            # Moving nodes around the canvas leaves the plan untouched
+            if needs_replan(data['operations']):
+                cur.execute(
+                    "SELECT nodes, connections FROM workflows WHERE id = %s",
+                    (workflow_id,)
+                )
+                graph = cur.fetchone()
+                try:
+                    plan = compile_plan(graph['nodes'], graph['connections'])
+                except WorkflowGraphError as e:
+                    conn.rollback()
+                    return jsonify({'error': str(e)}), 422
+                cur.execute(
+                    "UPDATE workflows SET execution_plan = %s WHERE id = %s",
+                    (json.dumps(plan), workflow_id)
+                )
+            conn.commit()
+            
+            result = {
+                'id': workflow_id,
+                'version': updated['version'],
+                'updated_at': updated['updated_at'],
+                'nodes': updated['nodes'],
+                'connections': updated['connections'],
+                'removed_nodes': changes['removed_nodes'],
+                'removed_connections': changes['removed_connections']
+            }
+            for field in changes['fields']:
+                result[field] = updated[field]
+            return jsonify(result)
+            
+    except Exception as e:
+        app.logger.error(f"Failed to patch workflow: {e}")
+        conn.rollback()
+        return jsonify({'error': 'Failed to patch workflow'}), 500
+    finally:
+        release_db_connection(conn)
 
 @app.route('/api/workflows/<workflow_id>', methods=['DELETE'])
 @require_auth
@@ -692,7 +859,47 @@ def delete_workflow(workflow_id):
         conn.rollback()
         return jsonify({'error': 'Failed to delete workflow'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+@app.route('/api/workflows/<workflow_id>/stats', methods=['GET'])
+@require_auth
+def get_workflow_stats(workflow_id):
+    """Daily execution history from the rollup table, oldest day first"""
+    try:
+        days = min(max(int(request.args.get('days', 30)), 1), 366)
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+        
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id FROM workflows WHERE id = %s AND user_id = %s",
+                (workflow_id, session['user_id'])
+            )
+            if not cur.fetchone():
+                return jsonify({'error': 'Workflow not found'}), 404
+            
+            cur.execute(
+                """SELECT day, executions, succeeded, failed, p50_duration_ms, p95_duration_ms
+                FROM workflow_daily_stats
+                WHERE workflow_id = %s AND day > CURRENT_DATE - %s::integer
+                ORDER BY day""",
+                (workflow_id, days)
+            )
+            stats = cur.fetchall()
+            for row in stats:
+                row['day'] = row['day'].isoformat()
+            return jsonify(stats)
+            
+    except Exception as e:
+        app.logger.error(f"Failed to get workflow stats: {e}")
+        return jsonify({'error': 'Failed to get workflow stats'}), 500
+    finally:
+        release_db_connection(conn)
 
 @app.route('/api/workflows/<workflow_id>/execute', methods=['POST'])
 @require_auth
@@ -709,7 +916,7 @@ def execute_workflow(workflow_id):
         with conn.cursor() as cur:
             # Get the workflow
             cur.execute(
-                "SELECT * FROM workflows WHERE id = %s AND user_id = %s",
+                "SELECT id FROM workflows WHERE id = %s AND user_id = %s",
                 (workflow_id, session['user_id'])
             )
             workflow = cur.fetchone()
@@ -717,38 +924,33 @@ def execute_workflow(workflow_id):
             if not workflow:
                 return jsonify({'error': 'Workflow not found'}), 404
             
-            # Create execution record
+            # Queue the execution; a background worker runs the workflow
             execution_id = f"exec-{uuid.uuid4().hex}"
-            cur.execute(
-                """INSERT INTO workflow_executions (id, workflow_id, status, started_at) 
-                VALUES (%s, %s, %s, %s)""",
-                (execution_id, workflow_id, 'running', datetime.now())
-            )
+            enqueue_execution(cur, execution_id, workflow_id, input_data)
             conn.commit()
             
-            # In a real implementation, this would execute the workflow
-            # For now, we'll simulate execution and return immediately
-            
-            # Simulate execution completion after a short delay
-            # In a real implementation, this would be handled asynchronously
-            
             return jsonify({
                 'success': True,
                 'executionId': execution_id,
-                'status': 'started',
-                'message': 'Workflow execution started'
+                'status': 'queued',
+                'message': 'Workflow execution queued'
             })
             
     except Exception as e:
         app.logger.error(f"Failed to execute workflow: {e}")
         return jsonify({'error': 'Failed to execute workflow'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+# Listings and detail views never read result payloads; results_size tells
+# the client whether fetching /results is worthwhile
+EXECUTION_SUMMARY_COLUMNS = """e.id, e.workflow_id, e.status, e.started_at, e.completed_at,
+    e.error_message, e.attempts, w.name AS workflow_name, r.size_bytes AS results_size"""
 
 @app.route('/api/executions/<execution_id>', methods=['GET'])
 @require_auth
 def get_execution(execution_id):
-    """Get execution details"""
+    """Get execution details; results are fetched separately"""
     conn = get_db_connection()
     if not conn:
         return jsonify({'error': 'Database connection failed'}), 500
@@ -756,10 +958,11 @@ def get_execution(execution_id):
     try:
         with conn.cursor() as cur:
             # Get the execution
-            cur.execute("""
-                SELECT e.*, w.name as workflow_name 
+            cur.execute(f"""
+                SELECT {EXECUTION_SUMMARY_COLUMNS}, e.input_data
                 FROM workflow_executions e
                 JOIN workflows w ON e.workflow_id = w.id
+                LEFT JOIN execution_results r ON r.execution_id = e.id
                 WHERE e.id = %s AND w.user_id = %s
             """, (execution_id, session['user_id']))
             
@@ -774,13 +977,61 @@ def get_execution(execution_id):
         app.logger.error(f"Failed to get execution: {e}")
         return jsonify({'error': 'Failed to get execution'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
+
+@app.route('/api/executions/<execution_id>/results', methods=['GET'])
+@require_auth
+def get_execution_results(execution_id):
+    """Get the results document of a single execution"""
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({'error': 'Database connection failed'}), 500
+        
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT e.status, r.encoding, r.payload,
+                    CASE WHEN r.execution_id IS NULL THEN e.results END AS legacy_results
+                FROM workflow_executions e
+                JOIN workflows w ON e.workflow_id = w.id
+                LEFT JOIN execution_results r ON r.execution_id = e.id
+                WHERE e.id = %s AND w.user_id = %s
+            """, (execution_id, session['user_id']))
+            row = cur.fetchone()
+            
+            if not row:
+                return jsonify({'error': 'Execution not found'}), 404
+            if row['encoding'] is None:
+                # Executions completed before results moved out of the row
+                if row['legacy_results'] is not None:
+                    return jsonify(row['legacy_results'])
+                return jsonify({'error': 'Results not available', 'status': row['status']}), 404
+            
+            # Clients that accept zstd get the stored bytes as they are
+            if row['encoding'] == ZSTD and request.accept_encodings.quality('zstd') > 0:
+                response = Response(bytes(row['payload']), mimetype='application/json')
+                response.headers['Content-Encoding'] = 'zstd'
+            else:
+                response = Response(decode_payload(row['encoding'], row['payload']), mimetype='application/json')
+            response.vary.add('Accept-Encoding')
+            return response
+            
+    except Exception as e:
+        app.logger.error(f"Failed to get execution results: {e}")
+        return jsonify({'error': 'Failed to get execution results'}), 500
+    finally:
+        release_db_connection(conn)
 
 @app.route('/api/executions', methods=['GET'])
 @require_auth
 def get_executions():
-    """Get all executions for the current user"""
+    """Get executions for the current user, one keyset page at a time"""
     workflow_id = request.args.get('workflow_id')
+    try:
+        limit = page_size(request.args)
+        after = decode_cursor(request.args.get('cursor'))
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     
     conn = get_db_connection()
     if not conn:
@@ -788,6 +1039,15 @@ def get_executions():
         
     try:
         with conn.cursor() as cur:
+            query = f"""
+                SELECT {EXECUTION_SUMMARY_COLUMNS}
+                FROM workflow_executions e
+                JOIN workflows w ON e.workflow_id = w.id
+                LEFT JOIN execution_results r ON r.execution_id = e.id
+                WHERE w.user_id = %s
+            """
+            params = [session['user_id']]
+            
             if workflow_id:
                 # Verify the user owns this workflow
                 cur.execute(
@@ -798,145 +1058,42 @@ def get_executions():
                     return jsonify({'error': 'Workflow not found'}), 404
                 
                 # Get executions for specific workflow
-                cur.execute("""
-                    SELECT e.*, w.name as workflow_name 
-                    FROM workflow_executions e
-                    JOIN workflows w ON e.workflow_id = w.id
-                    WHERE e.workflow_id = %s AND w.user_id = %s
-                    ORDER BY e.started_at DESC
-                """, (workflow_id, session['user_id']))
-            else:
-                # Get all executions for user
-                cur.execute("""
-                    SELECT e.*, w.name as workflow_name 
-                    FROM workflow_executions e
-                    JOIN workflows w ON e.workflow_id = w.id
-                    WHERE w.user_id = %s
-                    ORDER BY e.started_at DESC
-                    LIMIT 50
-                """, (session['user_id'],))
+                query += " AND e.workflow_id = %s"
+                params.append(workflow_id)
             
-            executions = cur.fetchall()
+            if after:
+                query += " AND (e.started_at, e.id) < (%s, %s)"
+                params.extend(after)
+            query += " ORDER BY e.started_at DESC, e.id DESC LIMIT %s"
+            params.append(limit + 1)
             
-            return jsonify(executions)
+            cur.execute(query, params)
+            executions, next_cursor = split_page(cur.fetchall(), limit, 'started_at')
+            
+            return paginated_response(executions, next_cursor)
             
     except Exception as e:
         app.logger.error(f"Failed to get executions: {e}")
         return jsonify({'error': 'Failed to get executions'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/tools', methods=['GET'])
-@require_auth
 def get_tools():
-    """Get available tools"""
-    category = request.args.get('category')
-    
-    # In a real implementation, this would come from a database
-    # For now, we'll return a static list
-    
-    tools = [
-        {
-            'id': 'schedule',
-            'name': 'Schedule Trigger',
-            'description': 'Activates the workflow at a specific time interval',
-            'category': 'trigger',
-            'icon': 'fas fa-clock',
-            'config': {
-                'frequency': ['minutes', 'hours', 'days', 'weeks'],
-                'interval': 1
-            }
-        },
-        {
-            'id': 'webhook',
-            'name': 'Webhook Trigger',
-            'description': 'Listens for incoming HTTP requests to trigger workflows',
-            'category': 'trigger',
-            'icon': 'fas fa-code-branch',
-            'config': {
-                'method': ['GET', 'POST', 'PUT'],
-                'path': ''
-            }
-        },
-        {
-            'id': 'slack',
-            'name': 'Slack Integration',
-            'description': 'Send messages to Slack channels',
-            'category': 'app',
-            'icon': 'fab fa-slack',
-            'config': {}
-        },
-        {
-            'id': 'email',
-            'name': 'Email Integration',
-            'description': 'Send emails using SMTP',
-            'category': 'app',
-            'icon': 'fas fa-envelope',
-            'config': {}
-        },
-        {
-            'id': 'http',
-            'name': 'HTTP Request',
-            'description': 'Make HTTP requests to external APIs',
-            'category': 'app',
-            'icon': 'fas fa-globe',
-            'config': {}
-        },
-        {
-            'id': 'pi-auth',
-            'name': 'Pi Authentication',
-            'description': 'Authenticate users with Pi Network',
-            'category': 'app',
-            'icon': 'fab fa-pi',
-            'config': {}
-        },
-        {
-            'id': 'code',
-            'name': 'Code',
-            'description': 'Execute custom JavaScript or Python code',
-            'category': 'data',
-            'icon': 'fas fa-code',
-            'config': {}
-        },
-        {
-            'id': 'set',
-            'name': 'Set',
-            'description': 'Set values in JSON data',
-            'category': 'data',
-            'icon': 'fas fa-edit',
-            'config': {}
-        },
-        {
-            'id': 'if',
-            'name': 'IF Condition',
-            'description': 'Conditional branching based on data',
-            'category': 'logic',
-            'icon': 'fas fa-question-circle',
-            'config': {}
-        },
-        {
-            'id': 'pi-payment',
-            'name': 'Pi Payment',
-            'description': 'Create Pi Network payments',
-            'category': 'utility',
-            'icon': 'fas fa-money-bill-wave',
-            'config': {}
-        },
-        {
-            'id': 'pi-data',
-            'name': 'Pi Blockchain Data',
-            'description': 'Read/write to Pi Blockchain',
-            'category': 'utility',
-            'icon': 'fas fa-database',
-            'config': {}
-        }
-    ]
-    
-    if category:
-        filtered_tools = [t for t in tools if t['category'] == category]
-        return jsonify(filtered_tools)
-    
-    return jsonify(tools)
+    """Get available tools
+
+    The catalog is the same for every user, so it is served without a session
+    lookup from bytes serialized at startup; clients revalidate with the ETag.
+    """
+    body, etag = tool_catalog.response(request.args.get('category') or None)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/webhook/<workflow_id>', methods=['GET', 'POST', 'PUT'])
 def handle_webhook(workflow_id):
@@ -949,48 +1106,55 @@ def handle_webhook(workflow_id):
     try:
         with conn.cursor() as cur:
             cur.execute(
-                "SELECT * FROM workflows WHERE id = %s AND status = 'active'",
+                "SELECT id FROM workflows WHERE id = %s AND status = 'active'",
                 (workflow_id,)
             )
             workflow = cur.fetchone()
-            
-            if not workflow:
-                return jsonify({'error': 'Workflow not found or not active'}), 404
-            
-            # Create execution record
-            execution_id = f"exec-{uuid.uuid4().hex}"
-            
-            # Prepare webhook data
-            webhook_data = {
-                'method': request.method,
-                'headers': dict(request.headers),
-                'params': dict(request.args),
-                'json': request.get_json(silent=True) or {},
-                'form': dict(request.form) if request.form else {},
-                'data': request.data.decode('utf-8') if request.data else ''
-            }
-            
-            cur.execute(
-                """INSERT INTO workflow_executions (id, workflow_id, status, started_at, results) 
-                VALUES (%s, %s, %s, %s, %s)""",
-                (execution_id, workflow_id, 'running', datetime.now(), json.dumps({'webhook_data': webhook_data}))
-            )
-            conn.commit()
-            
-            # In a real implementation, this would trigger the workflow execution
-            # For now, we'll just return the execution ID
-            
-            return jsonify({
-                'success': True,
-                'message': 'Webhook received and workflow triggered',
-                'executionId': execution_id
-            })
-            
     except Exception as e:
         app.logger.error(f"Webhook handling failed: {e}")
         return jsonify({'error': 'Webhook handling failed'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
+    
+    if not workflow:
+        return jsonify({'error': 'Workflow not found or not active'}), 404
+    
+    # Senders that retry pass the same Idempotency-Key and get one execution
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        return jsonify({'error': f'Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters'}), 400
+    execution_id = new_execution_id(workflow_id, idempotency_key)
+    
+    # Prepare webhook data
+    webhook_data = {
+        'method': request.method,
+        'headers': dict(request.headers),
+        'params': dict(request.args),
+        'json': request.get_json(silent=True) or {},
+        'form': dict(request.form) if request.form else {},
+        'data': request.data.decode('utf-8') if request.data else ''
+    }
+    
+    try:
+        # Group-committed with concurrent hooks; returns once the row is durable
+        ingest_webhook_execution(
+            execution_id, workflow_id, {'webhook_data': webhook_data},
+            idempotent=idempotency_key is not None
+        )
+    except IngestUnavailable as e:
+        app.logger.warning(str(e))
+        response = jsonify({'error': 'Webhook not recorded, please retry'})
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response, 503
+    except Exception as e:
+        app.logger.error(f"Webhook handling failed: {e}")
+        return jsonify({'error': 'Webhook handling failed'}), 500
+    
+    return jsonify({
+        'success': True,
+        'message': 'Webhook received and workflow triggered',
+        'executionId': execution_id
+    })
 
 @app.route('/api/user/profile', methods=['GET'])
 @require_auth
@@ -1017,7 +1181,7 @@ def get_profile():
         app.logger.error(f"Failed to get profile: {e}")
         return jsonify({'error': 'Failed to get profile'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 @app.route('/api/user/profile', methods=['PUT'])
 @require_auth
@@ -1053,8 +1217,10 @@ def update_profile():
         conn.rollback()
         return jsonify({'error': 'Failed to update profile'}), 500
     finally:
-        conn.close()
+        release_db_connection(conn)
 
 if __name__ == '__main__':
+    # Development server; production runs `gunicorn -c gunicorn.conf.py app:app`
+    ensure_schema()
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port)
+    app.run(debug=os.environ.get('FLASK_DEBUG', 'false').lower() == 'true', host='0.0.0.0', port=port)
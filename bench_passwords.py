@@ -0,0 +1,78 @@
+"""Login throughput versus password hashing cost
+
+    python bench_passwords.py --methods pbkdf2:sha256:100000,pbkdf2:sha256:260000,pbkdf2:sha256:600000
+    python bench_passwords.py --workers 4 --concurrency 32 --seconds 10
+
+For each hash method, simulates concurrent logins through the same bounded
+hashing pool the API uses and reports successful verifications per second,
+latency percentiles, and how many attempts were shed with 503. Use it to pick
+PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS and PASSWORD_HASH_MAX_PENDING for
+the target host.
+"""
+import time
+import argparse
+import threading
+from passwords import HashingPool, PasswordHashingBusy, _hash, _verify, HASH_WORKERS, MAX_PENDING
+
+def bench_method(method, workers, max_pending, concurrency, seconds):
+    pool = HashingPool(workers=workers, max_pending=max_pending)
+    stored = _hash('correct horse battery staple', method)
+    # Warm the pool so process start-up is not measured
+    pool.run(_verify, stored, 'correct horse battery staple', method)
+
+    latencies = []
+    shed = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                pool.run(_verify, stored, 'correct horse battery staple', method)
+            except PasswordHashingBusy:
+                with lock:
+                    shed[0] += 1
+                # A real client would honour Retry-After; back off briefly
+                time.sleep(0.01)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else float('nan')
+    return {
+        'method': method,
+        'logins_per_s': len(latencies) / elapsed,
+        'p50_ms': pct(0.5),
+        'p95_ms': pct(0.95),
+        'shed': shed[0]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark login throughput against hashing cost')
+    parser.add_argument('--methods', default='pbkdf2:sha256:100000,pbkdf2:sha256:260000,pbkdf2:sha256:600000')
+    parser.add_argument('--workers', type=int, default=max(HASH_WORKERS, 1))
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING)
+    parser.add_argument('--concurrency', type=int, default=16, help='simultaneous login attempts')
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"workers={args.workers} max_pending={args.max_pending} concurrency={args.concurrency}")
+    print(f"{'method':<28} {'logins/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'shed':>7}")
+    for method in args.methods.split(','):
+        result = bench_method(method.strip(), args.workers, args.max_pending, args.concurrency, args.seconds)
+        print(f"{result['method']:<28} {result['logins_per_s']:>10.1f} {result['p50_ms']:>9.1f} "
+              f"{result['p95_ms']:>9.1f} {result['shed']:>7}")
+
+if __name__ == '__main__':
+    main()
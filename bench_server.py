@@ -0,0 +1,140 @@
+"""Web throughput per gunicorn worker model
+
+    python bench_server.py --models sync,threaded,gevent --workers 2 --concurrency 32 --seconds 10
+    python bench_server.py --paths /api/tools,/api/tools?category=app,/ --header "Accept-Encoding: br"
+
+For each worker model, starts gunicorn with gunicorn.conf.py on a local port,
+drives the given paths round-robin from concurrent client threads and reports
+requests per second, latency percentiles and errors. Every model gets the same
+WEB_CONCURRENCY, so differences come from how a process serves concurrent
+requests. The client shares the host with the server, so run it on a machine
+with spare cores or compare models relative to each other only.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(model, workers, port):
+    env = dict(os.environ, WEB_WORKER_MODEL=model, WEB_CONCURRENCY=str(workers), PORT=str(port))
+    # Server logs go to a file: an undrained pipe would fill up and block
+    # gunicorn in the middle of a run
+    log = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log
+    )
+    # Start-up waits for the schema check, which can take a pool timeout
+    # when the database is down
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            log.seek(0)
+            raise RuntimeError(f"gunicorn exited: {log.read().decode(errors='replace')[-2000:]}")
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/tools', timeout=1)
+            log.close()
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    stop_server(process)
+    log.close()
+    raise RuntimeError('gunicorn did not start listening within 60s')
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def drive(base_url, paths, headers, concurrency, seconds):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client(offset):
+        session = requests.Session()
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                ok = session.get(base_url + path, headers=headers, timeout=30).status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def pct(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else float('nan')
+    return {
+        'requests_per_s': len(latencies) / elapsed,
+        'p50_ms': pct(0.5),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'errors': errors[0]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gunicorn worker models on hot endpoints')
+    parser.add_argument('--models', default='sync,threaded,gevent')
+    parser.add_argument('--workers', type=int, default=2, help='WEB_CONCURRENCY for every model')
+    parser.add_argument('--paths', default='/api/tools,/api/tools?category=trigger,/api/health,/')
+    parser.add_argument('--header', action='append', default=[], help='extra request header, "Name: value"')
+    parser.add_argument('--concurrency', type=int, default=32, help='simultaneous client connections')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    args = parser.parse_args()
+
+    paths = [path.strip() for path in args.paths.split(',') if path.strip()]
+    headers = {name.strip(): value.strip() for name, value in (header.split(':', 1) for header in args.header)}
+
+    print(f"workers={args.workers} concurrency={args.concurrency} paths={','.join(paths)}")
+    print(f"{'model':<10} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for model in args.models.split(','):
+        model = model.strip()
+        port = _free_port()
+        try:
+            process = start_server(model, args.workers, port)
+        except RuntimeError as e:
+            print(f"{model:<10} failed to start: {str(e).strip().splitlines()[-1]}")
+            continue
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            drive(base_url, paths, headers, args.concurrency, args.warmup)
+            result = drive(base_url, paths, headers, args.concurrency, args.seconds)
+        finally:
+            stop_server(process)
+        print(f"{model:<10} {result['requests_per_s']:>10.1f} {result['p50_ms']:>9.1f} "
+              f"{result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['errors']:>7}")
+
+if __name__ == '__main__':
+    main()
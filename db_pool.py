@@ -0,0 +1,104 @@
+import os
+import threading
+import logging
+import psycopg
+from psycopg import pq
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing is per process, so with gunicorn the total number of server
+# connections is roughly workers * DB_POOL_MAX_SIZE.
+POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 2))
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+POOL_MAX_IDLE = float(os.environ.get('DB_POOL_MAX_IDLE', 300))
+POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def _connection_kwargs():
+    """Connection parameters shared by every pooled connection"""
+    return {
+        'host': os.environ.get('DB_HOST', 'localhost'),
+        'dbname': os.environ.get('DB_NAME', 'pi_nocode_builder'),
+        'user': os.environ.get('DB_USER', 'postgres'),
+        'password': os.environ.get('DB_PASSWORD', 'password'),
+        'port': os.environ.get('DB_PORT', '5432'),
+        'row_factory': dict_row
+    }
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use
+
+    The pool is created lazily and re-created after a fork so that gunicorn
+    workers never share sockets inherited from the master process.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool(
+                kwargs=_connection_kwargs(),
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                timeout=POOL_TIMEOUT,
+                max_idle=POOL_MAX_IDLE,
+                max_lifetime=POOL_MAX_LIFETIME,
+                check=ConnectionPool.check_connection,
+                name=f'pi-nocode-{pid}',
+                open=True
+            )
+            _pool_pid = pid
+            logger.info(f"Database pool opened (min={POOL_MIN_SIZE}, max={POOL_MAX_SIZE})")
+    return _pool
+
+def get_db_connection():
+    """Check out a healthy connection from the pool, or None on failure"""
+    try:
+        return get_pool().getconn()
+    except Exception as e:
+        logger.error(f"Database connection failed: {e}")
+        return None
+
+def release_db_connection(conn):
+    """Return a connection to the pool; open transactions are rolled back"""
+    if conn is None:
+        return
+    try:
+        # Read-only handlers leave their implicit transaction open; ending it
+        # here avoids the pool's warning-and-rollback path on every request
+        if conn.info.transaction_status in (pq.TransactionStatus.INTRANS, pq.TransactionStatus.INERROR):
+            conn.rollback()
+        get_pool().putconn(conn)
+    except Exception as e:
+        logger.error(f"Failed to release database connection: {e}")
+
+def open_dedicated_connection(autocommit=True):
+    """Open a connection outside the pool, e.g. for LISTEN sessions"""
+    return psycopg.connect(autocommit=autocommit, **_connection_kwargs())
+
+def get_pool_stats():
+    """Return pool statistics for sizing and monitoring"""
+    if _pool is None or _pool_pid != os.getpid():
+        return {'status': 'not_initialized'}
+    stats = _pool.get_stats()
+    stats['min_size'] = _pool.min_size
+    stats['max_size'] = _pool.max_size
+    stats['pid'] = _pool_pid
+    return stats
+
+def close_pool():
+    """Close the pool, e.g. on worker shutdown"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+        _pool_pid = None
@@ -0,0 +1,268 @@
+import os
+import ast
+import math
+import time
+import operator
+from cache import TTLCache
+
+try:
+    import numpy as np
+except ImportError:  # batch evaluation falls back to a per-row loop
+    np = None
+
+# Arithmetic expressions are parsed to an AST once, checked against a
+# whitelist and compiled into a tree of Python closures. The same closures
+# evaluate scalars or, for batches, whole NumPy arrays at once.
+MAX_EXPRESSION_LENGTH = int(os.environ.get('CALC_MAX_LENGTH', 500))
+MAX_DEPTH = int(os.environ.get('CALC_MAX_DEPTH', 50))
+MAX_INT_BITS = int(os.environ.get('CALC_MAX_INT_BITS', 4096))
+MAX_EVAL_SECONDS = float(os.environ.get('CALC_MAX_EVAL_SECONDS', 0.05))
+MAX_BATCH_SIZE = int(os.environ.get('CALC_MAX_BATCH_SIZE', 100000))
+CACHE_SIZE = int(os.environ.get('CALC_CACHE_SIZE', 2048))
+# Digits beyond a float's range change nothing
+MAX_ROUND_DIGITS = 308
+
+class ExpressionError(ValueError):
+    """Raised for expressions that cannot be parsed, compiled or evaluated"""
+
+_compiled = TTLCache(maxsize=CACHE_SIZE, ttl=None)
+
+def _check_int(value):
+    """Reject integers too large to keep arithmetic cheap"""
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise ExpressionError(f'Result exceeds {MAX_INT_BITS} bits')
+    return value
+
+def _safe_pow(base, exponent):
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        # |base| >= 2 ** (bit_length - 1), so this is a lower bound on the
+        # result's size and exact for powers of two
+        if abs(base) > 1 and (base.bit_length() - 1) * exponent + 1 > MAX_INT_BITS:
+            raise ExpressionError(f'Result exceeds {MAX_INT_BITS} bits')
+    result = operator.pow(base, exponent)
+    if isinstance(result, complex):
+        raise ExpressionError('Result is not a real number')
+    return result
+
+def _check_ndigits(ndigits):
+    """round() on an int with a huge negative ndigits takes seconds"""
+    if isinstance(ndigits, bool) or not isinstance(ndigits, int) or abs(ndigits) > MAX_ROUND_DIGITS:
+        raise ExpressionError(f'round() digits must be an integer between -{MAX_ROUND_DIGITS} and {MAX_ROUND_DIGITS}')
+    return ndigits
+
+def _safe_round(number, ndigits=None):
+    if ndigits is None:
+        return round(number)
+    return round(number, _check_ndigits(ndigits))
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _safe_pow
+}
+
+_UNARY_OPS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg
+}
+
+# name -> (scalar implementation, vectorized implementation)
+_FUNCTIONS = {
+    'abs': (abs, 'abs'),
+    'sqrt': (math.sqrt, 'sqrt'),
+    'exp': (math.exp, 'exp'),
+    'log': (math.log, 'log'),
+    'log10': (math.log10, 'log10'),
+    'sin': (math.sin, 'sin'),
+    'cos': (math.cos, 'cos'),
+    'tan': (math.tan, 'tan'),
+    'floor': (math.floor, 'floor'),
+    'ceil': (math.ceil, 'ceil'),
+    'round': (_safe_round, 'round'),
+    'min': (min, 'minimum'),
+    'max': (max, 'maximum')
+}
+
+_CONSTANTS = {
+    'pi': math.pi,
+    'e': math.e
+}
+
+class _Context:
+    """Per-evaluation state: variable bindings and the time budget"""
+    __slots__ = ('env', 'deadline', 'vector')
+
+    def __init__(self, env, vector=False):
+        self.env = env
+        self.deadline = time.perf_counter() + MAX_EVAL_SECONDS
+        self.vector = vector
+
+    def tick(self):
+        if time.perf_counter() > self.deadline:
+            raise ExpressionError('Evaluation time limit exceeded')
+
+def _compile_node(node, depth, variables):
+    """Turn a whitelisted AST node into a closure taking a _Context"""
+    if depth > MAX_DEPTH:
+        raise ExpressionError(f'Expression nested deeper than {MAX_DEPTH} levels')
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError('Only numeric literals are allowed')
+        value = _check_int(node.value)
+        return lambda ctx: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in _CONSTANTS:
+            value = _CONSTANTS[name]
+            return lambda ctx: value
+        variables.add(name)
+
+        def load(ctx):
+            try:
+                value = ctx.env[name]
+            except KeyError:
+                raise ExpressionError(f'Missing value for variable: {name}')
+            if ctx.vector:
+                # Batch columns are already float64 arrays
+                return value
+            if not isinstance(value, (bool, int, float)):
+                raise ExpressionError(f'Value for variable {name} must be a number')
+            return _check_int(value)
+        return load
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left = _compile_node(node.left, depth + 1, variables)
+        right = _compile_node(node.right, depth + 1, variables)
+
+        def binary(ctx):
+            ctx.tick()
+            return _check_int(op(left(ctx), right(ctx)))
+        return binary
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        op = _UNARY_OPS[type(node.op)]
+        operand = _compile_node(node.operand, depth + 1, variables)
+        return lambda ctx: op(operand(ctx))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS:
+        if node.keywords:
+            raise ExpressionError('Keyword arguments are not allowed')
+        scalar_fn, vector_name = _FUNCTIONS[node.func.id]
+        if not node.args:
+            raise ExpressionError(f'{node.func.id}() needs at least one argument')
+        args = [_compile_node(arg, depth + 1, variables) for arg in node.args]
+
+        def call(ctx):
+            ctx.tick()
+            values = [arg(ctx) for arg in args]
+            if ctx.vector:
+                vector_fn = getattr(np, vector_name)
+                if vector_name == 'round' and len(values) > 1:
+                    _check_ndigits(values[1])
+                if vector_name in ('minimum', 'maximum'):
+                    result = values[0]
+                    for value in values[1:]:
+                        result = vector_fn(result, value)
+                    return result
+                return vector_fn(*values)
+            return scalar_fn(*values)
+        return call
+
+    raise ExpressionError(f'Unsupported syntax: {type(node).__name__}')
+
+class CompiledExpression:
+    """A parsed and validated expression ready for repeated evaluation"""
+    __slots__ = ('text', 'variables', '_root')
+
+    def __init__(self, text):
+        if len(text) > MAX_EXPRESSION_LENGTH:
+            raise ExpressionError(f'Expression longer than {MAX_EXPRESSION_LENGTH} characters')
+        try:
+            tree = ast.parse(text, mode='eval')
+        except (SyntaxError, ValueError) as e:
+            raise ExpressionError(f'Invalid expression: {e}')
+        variables = set()
+        self._root = _compile_node(tree.body, 0, variables)
+        self.text = text
+        self.variables = frozenset(variables)
+
+    def evaluate(self, bindings=None):
+        """Evaluate once with scalar variable bindings"""
+        try:
+            return self._root(_Context(bindings or {}))
+        except ExpressionError:
+            raise
+        except (ArithmeticError, ValueError, TypeError) as e:
+            raise ExpressionError(str(e))
+
+    def evaluate_batch(self, bindings_list):
+        """Evaluate over many bindings; vectorized with NumPy when available
+
+        Returns one result per binding; rows whose result is not a finite
+        number (division by zero, domain errors) yield None.
+        """
+        if not isinstance(bindings_list, list) or not all(isinstance(bindings, dict) for bindings in bindings_list):
+            raise ExpressionError('Bindings must be a list of objects')
+        if len(bindings_list) > MAX_BATCH_SIZE:
+            raise ExpressionError(f'Batch larger than {MAX_BATCH_SIZE} rows')
+        if not bindings_list:
+            return []
+        if np is None:
+            return [self._evaluate_row(bindings) for bindings in bindings_list]
+
+        try:
+            env = {
+                name: np.asarray([bindings[name] for bindings in bindings_list], dtype=np.float64)
+                for name in self.variables
+            }
+        except KeyError as e:
+            raise ExpressionError(f'Missing value for variable: {e.args[0]}')
+        except (TypeError, ValueError):
+            raise ExpressionError('Variable values must be numeric')
+
+        with np.errstate(all='ignore'):
+            try:
+                result = self._root(_Context(env, vector=True))
+            except ExpressionError:
+                raise
+            except (ArithmeticError, ValueError, TypeError) as e:
+                raise ExpressionError(str(e))
+            result = np.broadcast_to(np.asarray(result, dtype=np.float64), (len(bindings_list),))
+            finite = np.isfinite(result)
+        return [value if ok else None for value, ok in zip(result.tolist(), finite.tolist())]
+
+    def _evaluate_row(self, bindings):
+        try:
+            result = self.evaluate(bindings)
+        except ExpressionError as e:
+            if str(e).startswith('Missing value'):
+                raise
+            return None
+        if isinstance(result, float) and not math.isfinite(result):
+            return None
+        return result
+
+def compile_expression(text):
+    """Return the cached compiled form of an expression"""
+    text = text.strip()
+    compiled = _compiled.get(text)
+    if compiled is None:
+        compiled = CompiledExpression(text)
+        _compiled.set(text, compiled)
+    return compiled
+
+def evaluate(text, bindings=None):
+    return compile_expression(text).evaluate(bindings)
+
+def evaluate_batch(text, bindings_list):
+    return compile_expression(text).evaluate_batch(bindings_list)
+
+def expression_cache_stats():
+    return _compiled.stats()
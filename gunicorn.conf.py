@@ -0,0 +1,69 @@
+"""Production web server settings
+
+    gunicorn -c gunicorn.conf.py app:app
+
+WEB_WORKER_MODEL picks how each worker process serves requests:
+
+    sync      one request at a time per process
+    threaded  WEB_THREADS requests per process on a thread pool (gthread)
+    gevent    WEB_WORKER_CONNECTIONS requests per process on greenlets
+
+The app is imported once in the master before forking (preload_app), so
+imports, template compilation and the tool catalog are shared copy-on-write.
+Workers are recycled after WEB_MAX_REQUESTS requests (with jitter so they do
+not all restart together) to bound memory growth.
+
+Reloads: `kill -HUP <master>` replaces workers gracefully but keeps the
+preloaded code. To deploy new code without dropping requests, send USR2 to
+start a new master, then WINCH and QUIT to the old one.
+"""
+import os
+import multiprocessing
+
+WORKER_MODELS = {
+    'sync': 'sync',
+    'threaded': 'gthread',
+    'gevent': 'gevent'
+}
+
+worker_model = os.environ.get('WEB_WORKER_MODEL', 'threaded')
+if worker_model not in WORKER_MODELS:
+    raise ValueError(f"WEB_WORKER_MODEL must be one of {', '.join(WORKER_MODELS)}, not {worker_model!r}")
+
+if worker_model == 'gevent':
+    # Patch before the app is preloaded so its sockets and locks cooperate
+    from gevent import monkey
+    monkey.patch_all()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+worker_class = WORKER_MODELS[worker_model]
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('WEB_THREADS', 4)) if worker_model == 'threaded' else 1
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 100))
+
+preload_app = os.environ.get('WEB_PRELOAD', 'true').lower() == 'true'
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', max_requests // 10))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+# Below the platform's shutdown grace period, so in-flight requests finish
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 25))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+errorlog = '-'
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+def when_ready(server):
+    # Schema changes are applied by `python migrate.py upgrade` (release
+    # phase); the server only verifies on boot that the schema is current.
+    # The check uses the master's pool, which is closed again before forking
+    # since workers open their own.
+    from migrate import ensure_schema
+    from db_pool import close_pool
+    ensure_schema()
+    close_pool()
+    server.log.info(f"Serving with {workers} {worker_model} worker(s)")
+
+def worker_exit(server, worker):
+    from db_pool import close_pool
+    close_pool()
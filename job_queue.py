@@ -0,0 +1,123 @@
+import os
+import json
+import random
+import logging
+from result_store import store_results
+
+logger = logging.getLogger(__name__)
+
+# workflow_executions doubles as a durable job queue: queued rows are claimed
+# with FOR UPDATE SKIP LOCKED, held under a lease that the worker extends with
+# heartbeats, and re-queued with exponential backoff when a run fails.
+NOTIFY_CHANNEL = 'workflow_jobs'
+LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 60))
+MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 5))
+RETRY_MAX_SECONDS = float(os.environ.get('JOB_RETRY_MAX_SECONDS', 600))
+
+def enqueue_execution(cur, execution_id, workflow_id, input_data=None):
+    """Insert a queued execution and wake idle workers once the caller commits"""
+    cur.execute(
+        """INSERT INTO workflow_executions (id, workflow_id, status, started_at, run_after, input_data, max_attempts)
+        VALUES (%s, %s, 'queued', LOCALTIMESTAMP, LOCALTIMESTAMP, %s, %s)""",
+        (execution_id, workflow_id, json.dumps(input_data or {}), MAX_ATTEMPTS)
+    )
+    notify_workers(cur)
+
+def notify_workers(cur):
+    """Send a wake-up; Postgres delivers it only when the transaction commits"""
+    cur.execute("SELECT pg_notify(%s, '')", (NOTIFY_CHANNEL,))
+
+def claim_job(conn, worker_id):
+    """Claim the next runnable job, or return None when the queue is empty
+
+    Queued rows whose run_after has passed are eligible, as are running rows
+    whose lease expired because their worker died and that have attempts
+    left. Expired jobs without attempts left are marked failed first, in the
+    same transaction, so a job whose worker was killed on its final attempt
+    does not stay 'running' forever.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE workflow_executions
+            SET status = 'failed', completed_at = LOCALTIMESTAMP, locked_by = NULL, lease_expires_at = NULL,
+                error_message = COALESCE(error_message, 'Lease expired on the final attempt')
+            WHERE status = 'running' AND lease_expires_at < LOCALTIMESTAMP AND attempts >= max_attempts"""
+        )
+        cur.execute(
+            """UPDATE workflow_executions
+            SET status = 'running', locked_by = %s, attempts = attempts + 1,
+                lease_expires_at = LOCALTIMESTAMP + make_interval(secs => %s)
+            WHERE id = (
+                SELECT id FROM workflow_executions
+                WHERE (status = 'queued' AND run_after <= LOCALTIMESTAMP)
+                   OR (status = 'running' AND lease_expires_at < LOCALTIMESTAMP AND attempts < max_attempts)
+                ORDER BY run_after
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, workflow_id, started_at, input_data, attempts, max_attempts""",
+            (worker_id, LEASE_SECONDS)
+        )
+        job = cur.fetchone()
+    conn.commit()
+    return job
+
+# Updates below filter on started_at as well as id so Postgres only touches
+# the partition holding the job.
+
+def heartbeat(conn, job, worker_id):
+    """Extend the lease on a running job; False if the lease was lost"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE workflow_executions
+            SET lease_expires_at = LOCALTIMESTAMP + make_interval(secs => %s)
+            WHERE id = %s AND started_at = %s AND locked_by = %s AND status = 'running'""",
+            (LEASE_SECONDS, job['id'], job['started_at'], worker_id)
+        )
+        renewed = cur.rowcount == 1
+    conn.commit()
+    return renewed
+
+def complete_job(conn, job, worker_id, results):
+    """Mark a job completed and store its results, if the lease is still held"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE workflow_executions
+            SET status = 'completed', completed_at = LOCALTIMESTAMP,
+                error_message = NULL, locked_by = NULL, lease_expires_at = NULL
+            WHERE id = %s AND started_at = %s AND locked_by = %s""",
+            (job['id'], job['started_at'], worker_id)
+        )
+        if cur.rowcount == 1:
+            store_results(cur, job['id'], job['workflow_id'], results)
+    conn.commit()
+
+def retry_delay(attempts):
+    """Exponential backoff with equal jitter (half fixed, half random) for the given attempt number"""
+    ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return random.uniform(ceiling / 2, ceiling)
+
+def fail_job(conn, job, worker_id, error_message, retryable=True):
+    """Re-queue a failed job with backoff, or mark it failed when exhausted"""
+    with conn.cursor() as cur:
+        if retryable and job['attempts'] < job['max_attempts']:
+            cur.execute(
+                """UPDATE workflow_executions
+                SET status = 'queued', error_message = %s, locked_by = NULL, lease_expires_at = NULL,
+                    run_after = LOCALTIMESTAMP + make_interval(secs => %s)
+                WHERE id = %s AND started_at = %s AND locked_by = %s""",
+                (error_message, retry_delay(job['attempts']), job['id'], job['started_at'], worker_id)
+            )
+            status = 'queued'
+        else:
+            cur.execute(
+                """UPDATE workflow_executions
+                SET status = 'failed', completed_at = LOCALTIMESTAMP, error_message = %s,
+                    locked_by = NULL, lease_expires_at = NULL
+                WHERE id = %s AND started_at = %s AND locked_by = %s""",
+                (error_message, job['id'], job['started_at'], worker_id)
+            )
+            status = 'failed'
+    conn.commit()
+    return status
@@ -0,0 +1,230 @@
+"""Versioned schema migrations
+
+    python migrate.py upgrade       # apply pending migrations
+    python migrate.py status        # list applied and pending versions
+    python migrate.py check-plans   # report hot queries planned as seq scans
+
+Migrations are SQL files in migrations/ named NNNN_description.sql and are
+recorded in the schema_migrations ledger once applied. Files whose first line
+is "-- no-transaction" run statement by statement in autocommit mode, which
+CREATE INDEX CONCURRENTLY requires; all others run in a single transaction.
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+from psycopg import ClientCursor, sql
+from db_pool import get_db_connection, release_db_connection, open_dedicated_connection
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'false').lower() == 'true'
+# Serialises concurrent upgrades (e.g. several release jobs starting at once)
+ADVISORY_LOCK_ID = 7413001
+
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.sql$')
+_CONCURRENT_INDEX = re.compile(
+    r'^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.IGNORECASE
+)
+
+class Migration:
+    __slots__ = ('version', 'name', 'sql', 'transactional')
+
+    def __init__(self, version, name, sql):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        self.transactional = not sql.lstrip().startswith('-- no-transaction')
+
+    def statements(self):
+        """Split a no-transaction migration into individual statements"""
+        body = '\n'.join(line for line in self.sql.splitlines() if not line.strip().startswith('--'))
+        return [statement.strip() for statement in body.split(';') if statement.strip()]
+
+def load_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            migrations.append(Migration(int(match.group(1)), match.group(2), f.read()))
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('Duplicate migration version numbers')
+    return migrations
+
+def applied_versions(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations') AS ledger")
+        if cur.fetchone()['ledger'] is None:
+            return set()
+        cur.execute("SELECT version FROM schema_migrations")
+        return {row['version'] for row in cur.fetchall()}
+
+def pending_migrations(conn):
+    applied = applied_versions(conn)
+    return [migration for migration in load_migrations() if migration.version not in applied]
+
+def upgrade():
+    """Apply all pending migrations; returns the versions applied"""
+    conn = open_dedicated_connection(autocommit=True)
+    try:
+        conn.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_ID,))
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        applied = []
+        for migration in pending_migrations(conn):
+            logger.info(f"Applying migration {migration.version:04d}_{migration.name}")
+            if migration.transactional:
+                with conn.transaction():
+                    conn.execute(migration.sql)
+                    _record(conn, migration)
+            else:
+                for statement in migration.statements():
+                    _drop_invalid_index(conn, statement)
+                    conn.execute(statement)
+                _record(conn, migration)
+            applied.append(migration.version)
+        return applied
+    finally:
+        conn.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_ID,))
+        conn.close()
+
+def _drop_invalid_index(conn, statement):
+    """Drop the INVALID index a failed CREATE INDEX CONCURRENTLY left behind
+
+    IF NOT EXISTS would otherwise skip the half-built index on every re-run
+    and the planner would never be able to use it.
+    """
+    match = _CONCURRENT_INDEX.match(statement)
+    if not match:
+        return
+    row = conn.execute(
+        "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (match.group(1),)
+    ).fetchone()
+    if row is not None and not row['indisvalid']:
+        logger.warning(f"Dropping invalid index {match.group(1)} left by an earlier failed build")
+        conn.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(match.group(1))))
+
+def _record(conn, migration):
+    conn.execute(
+        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+        (migration.version, migration.name)
+    )
+
+def ensure_schema():
+    """Cheap boot-time check; migrations only run here when AUTO_MIGRATE=true
+
+    Called once at process start-up by the web server and worker entry
+    points, not on import.
+    """
+    conn = get_db_connection()
+    if not conn:
+        logger.error("Schema check skipped: database unavailable")
+        return False
+    try:
+        pending = pending_migrations(conn)
+    except Exception as e:
+        logger.error(f"Schema check failed: {e}")
+        return False
+    finally:
+        release_db_connection(conn)
+
+    if not pending:
+        return True
+    if AUTO_MIGRATE:
+        upgrade()
+        return True
+    logger.warning(
+        f"{len(pending)} pending migration(s): "
+        f"{', '.join(f'{m.version:04d}_{m.name}' for m in pending)}; run 'python migrate.py upgrade'"
+    )
+    return False
+
+# Queries on the request path with representative parameters. check_plans
+# disables sequential scans for the session: if the planner still chooses
+# one, no index can serve the query.
+HOT_QUERIES = [
+    ('list workflows',
+     "SELECT id, name, description, status, created_at, updated_at FROM workflows "
+     "WHERE user_id = %s ORDER BY updated_at DESC, id DESC LIMIT 51", (1,)),
+    ('get workflow',
+     "SELECT * FROM workflows WHERE id = %s AND user_id = %s", ('wf-x', 1)),
+    ('list workflow executions',
+     "SELECT e.id FROM workflow_executions e JOIN workflows w ON e.workflow_id = w.id "
+     "WHERE w.user_id = %s AND e.workflow_id = %s ORDER BY e.started_at DESC, e.id DESC LIMIT 51", (1, 'wf-x')),
+    ('list user executions',
+     "SELECT e.id FROM workflow_executions e JOIN workflows w ON e.workflow_id = w.id "
+     "WHERE w.user_id = %s ORDER BY e.started_at DESC, e.id DESC LIMIT 51", (1,)),
+    ('claim queued job',
+     "SELECT id FROM workflow_executions WHERE (status = 'queued' AND run_after <= LOCALTIMESTAMP) "
+     "OR (status = 'running' AND lease_expires_at < LOCALTIMESTAMP AND attempts < max_attempts) "
+     "ORDER BY run_after LIMIT 1", ()),
+    ('user by id', "SELECT id FROM users WHERE id = %s", (1,)),
+    ('user by email', "SELECT * FROM users WHERE email = %s", ('x@example.com',)),
+    ('user by pi_uid', "SELECT * FROM users WHERE pi_uid = %s", ('pi-x',))
+]
+
+def _seq_scans(plan):
+    """Relations read by Seq Scan nodes anywhere in a JSON plan tree"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(_seq_scans(child))
+    return found
+
+def check_plans(conn, queries=HOT_QUERIES):
+    """Return {query name: [relations]} for hot queries that need a seq scan"""
+    problems = {}
+    with conn.transaction():
+        conn.execute("SET LOCAL enable_seqscan = off")
+        with ClientCursor(conn) as cur:
+            for name, query, params in queries:
+                cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cur.fetchone()
+                plan = plan['QUERY PLAN'] if isinstance(plan, dict) else plan[0]
+                relations = _seq_scans(plan[0]['Plan'])
+                if relations:
+                    problems[name] = relations
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage database schema migrations')
+    parser.add_argument('command', choices=['upgrade', 'status', 'check-plans'])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+
+    if args.command == 'upgrade':
+        applied = upgrade()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+        return 0
+
+    conn = open_dedicated_connection(autocommit=True)
+    try:
+        if args.command == 'status':
+            applied = applied_versions(conn)
+            for migration in load_migrations():
+                state = 'applied' if migration.version in applied else 'pending'
+                print(f"{migration.version:04d}_{migration.name}: {state}")
+            return 0
+
+        problems = check_plans(conn)
+        for name, relations in problems.items():
+            print(f"SEQ SCAN  {name}: {', '.join(relations)}")
+        if not problems:
+            print(f"All {len(HOT_QUERIES)} hot queries can use an index")
+        return 1 if problems else 0
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
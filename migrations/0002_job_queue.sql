@@ -0,0 +1,12 @@
+-- Job queue columns used by the background workers
+ALTER TABLE workflow_executions
+    ADD COLUMN IF NOT EXISTS input_data JSONB,
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 3,
+    ADD COLUMN IF NOT EXISTS run_after TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS locked_by VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_workflow_executions_queue
+    ON workflow_executions (run_after)
+    WHERE status IN ('queued', 'running');
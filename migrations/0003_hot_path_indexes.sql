@@ -0,0 +1,19 @@
+-- no-transaction
+-- Indexes for the hot queries; built CONCURRENTLY so live tables stay writable.
+-- users.email needs no extra index: its UNIQUE constraint already provides one.
+
+-- GET /api/workflows keyset listing and ownership checks
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflows_user_updated
+    ON workflows (user_id, updated_at DESC, id DESC);
+
+-- GET /api/executions?workflow_id= keyset listing
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_executions_workflow_started
+    ON workflow_executions (workflow_id, started_at DESC, id DESC);
+
+-- GET /api/executions across all of a user's workflows
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_workflow_executions_started
+    ON workflow_executions (started_at DESC, id DESC);
+
+-- /api/auth/pi lookup
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_pi_uid
+    ON users (pi_uid);
@@ -0,0 +1,2 @@
+-- Optimistic concurrency for partial workflow updates
+ALTER TABLE workflows ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,2 @@
+-- Compiled execution plan persisted whenever a workflow's graph is saved
+ALTER TABLE workflows ADD COLUMN IF NOT EXISTS execution_plan JSONB;
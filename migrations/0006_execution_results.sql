@@ -0,0 +1,17 @@
+-- Execution results live outside workflow_executions so listings never read
+-- them. Payloads are stored as (optionally zstd-compressed) JSON bytes.
+CREATE TABLE IF NOT EXISTS execution_results (
+    execution_id VARCHAR(255) PRIMARY KEY,
+    workflow_id VARCHAR(255) NOT NULL,
+    encoding VARCHAR(16) NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    stored_bytes INTEGER NOT NULL,
+    payload BYTEA NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Payloads are already compressed; skip pglz and keep them out of line
+ALTER TABLE execution_results ALTER COLUMN payload SET STORAGE EXTERNAL;
+
+CREATE INDEX IF NOT EXISTS idx_execution_results_workflow
+    ON execution_results (workflow_id);
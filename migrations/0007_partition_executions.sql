@@ -0,0 +1,86 @@
+-- Range-partition workflow_executions by started_at. Existing rows are copied
+-- into monthly partitions; partitions.py creates future partitions at the
+-- configured granularity and drops expired ones.
+ALTER TABLE workflow_executions RENAME TO workflow_executions_unpartitioned;
+ALTER INDEX IF EXISTS workflow_executions_pkey RENAME TO workflow_executions_unpartitioned_pkey;
+DROP INDEX IF EXISTS idx_workflow_executions_queue;
+DROP INDEX IF EXISTS idx_workflow_executions_workflow_started;
+DROP INDEX IF EXISTS idx_workflow_executions_started;
+
+-- The partition key has to be part of the primary key
+CREATE TABLE workflow_executions (
+    id VARCHAR(255) NOT NULL,
+    workflow_id VARCHAR(255) REFERENCES workflows(id),
+    status VARCHAR(50) NOT NULL,
+    started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP,
+    results JSONB,
+    error_message TEXT,
+    input_data JSONB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    locked_by VARCHAR(255),
+    lease_expires_at TIMESTAMP,
+    PRIMARY KEY (id, started_at)
+) PARTITION BY RANGE (started_at);
+
+-- Catches rows outside every partition; normally stays empty because
+-- partitions are created ahead of time
+CREATE TABLE workflow_executions_default PARTITION OF workflow_executions DEFAULT;
+
+DO $$
+DECLARE
+    month_start TIMESTAMP;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE(first_started, LOCALTIMESTAMP)),
+            date_trunc('month', LOCALTIMESTAMP) + INTERVAL '1 month',
+            INTERVAL '1 month'
+        )
+        FROM (SELECT MIN(started_at) AS first_started FROM workflow_executions_unpartitioned) bounds
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF workflow_executions FOR VALUES FROM (%L) TO (%L)',
+            'workflow_executions_p' || to_char(month_start, 'YYYYMMDD'),
+            month_start,
+            month_start + INTERVAL '1 month'
+        );
+    END LOOP;
+END
+$$;
+
+-- Indexes on the parent are created on every partition, present and future
+CREATE INDEX idx_workflow_executions_queue
+    ON workflow_executions (run_after)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX idx_workflow_executions_workflow_started
+    ON workflow_executions (workflow_id, started_at DESC, id DESC);
+CREATE INDEX idx_workflow_executions_started
+    ON workflow_executions (started_at DESC, id DESC);
+
+INSERT INTO workflow_executions (
+    id, workflow_id, status, started_at, completed_at, results, error_message,
+    input_data, attempts, max_attempts, run_after, locked_by, lease_expires_at
+)
+SELECT
+    id, workflow_id, status, COALESCE(started_at, LOCALTIMESTAMP), completed_at, results, error_message,
+    input_data, attempts, max_attempts, run_after, locked_by, lease_expires_at
+FROM workflow_executions_unpartitioned;
+
+DROP TABLE workflow_executions_unpartitioned;
+
+-- Per-workflow daily history for dashboards, kept after raw partitions expire.
+-- Durations run from enqueue (started_at) to completion.
+CREATE TABLE IF NOT EXISTS workflow_daily_stats (
+    workflow_id VARCHAR(255) NOT NULL,
+    day DATE NOT NULL,
+    executions INTEGER NOT NULL,
+    succeeded INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    p50_duration_ms DOUBLE PRECISION,
+    p95_duration_ms DOUBLE PRECISION,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (workflow_id, day)
+);
@@ -0,0 +1,28 @@
+-- Ledger of Pi payments. Status moves created -> approved -> completing ->
+-- completed, or to failed; the reconciler in payments.py drives every
+-- transition after completing and re-polls payments that stall.
+CREATE TABLE IF NOT EXISTS payments (
+    id VARCHAR(255) PRIMARY KEY,
+    user_id INTEGER REFERENCES users(id),
+    amount NUMERIC(20, 7),
+    memo TEXT,
+    metadata JSONB,
+    status VARCHAR(20) NOT NULL
+        CHECK (status IN ('created', 'approved', 'completing', 'completed', 'failed')),
+    txid VARCHAR(255),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP
+);
+
+-- Reconciler claim query; settled payments drop out of the index
+CREATE INDEX IF NOT EXISTS idx_payments_pending
+    ON payments (next_attempt_at)
+    WHERE status IN ('created', 'approved', 'completing');
+
+CREATE INDEX IF NOT EXISTS idx_payments_user
+    ON payments (user_id, created_at DESC);
@@ -0,0 +1,5 @@
+-- Workflow listings are keyset-paginated on (updated_at, id); a NULL
+-- updated_at would produce a cursor no later row compares against.
+UPDATE workflows SET updated_at = COALESCE(created_at, LOCALTIMESTAMP) WHERE updated_at IS NULL;
+ALTER TABLE workflows ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE workflows ALTER COLUMN updated_at SET NOT NULL;
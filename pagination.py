@@ -0,0 +1,60 @@
+import os
+import json
+import base64
+from datetime import datetime
+from flask import jsonify
+
+# Keyset pagination: listings are ordered by (timestamp, id) descending and a
+# page continues strictly after the last row of the previous one, so the cost
+# of a page does not grow with how far into the listing a client is.
+# Responses keep their JSON array body; the cursor for the next page is sent
+# in the X-Next-Cursor header and passed back as ?cursor=. A NULL sort value
+# is carried as null; queries over nullable columns must order NULLs first.
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+
+class CursorError(ValueError):
+    """Raised for malformed cursors or page sizes"""
+
+def page_size(args):
+    """Read ?limit= and clamp it to MAX_PAGE_SIZE"""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise CursorError('limit must be an integer')
+    if limit < 1:
+        raise CursorError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+def encode_cursor(sort_value, row_id):
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (timestamp or None, id) from a cursor, or None when no cursor is given"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return (None if sort_value is None else datetime.fromisoformat(sort_value)), row_id
+    except (ValueError, TypeError):
+        raise CursorError('Invalid cursor')
+
+def split_page(rows, limit, sort_key, id_key='id'):
+    """Trim a limit + 1 fetch to one page and build the next cursor"""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    if isinstance(last, dict):
+        return page, encode_cursor(last[sort_key], last[id_key])
+    return page, encode_cursor(getattr(last, sort_key), getattr(last, id_key))
+
+def paginated_response(items, next_cursor):
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,231 @@
+"""Partition maintenance for workflow_executions
+
+    python partitions.py maintain          # create, roll up and drop partitions
+    python partitions.py rollup --days 7   # recompute recent daily rollups
+    python partitions.py status            # list partitions and their ranges
+
+workflow_executions is range-partitioned by started_at. Maintenance keeps
+EXECUTION_PARTITIONS_AHEAD future partitions in place, refreshes the
+workflow_daily_stats rollups, and drops partitions older than
+EXECUTION_RETENTION_DAYS once their days have been rolled up. The worker
+supervisor runs it every MAINTENANCE_INTERVAL seconds.
+"""
+import os
+import re
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+from psycopg import sql
+from db_pool import open_dedicated_connection
+
+logger = logging.getLogger(__name__)
+
+PARTITION_INTERVAL = os.environ.get('EXECUTION_PARTITION_INTERVAL', 'month')
+PARTITIONS_AHEAD = int(os.environ.get('EXECUTION_PARTITIONS_AHEAD', 3))
+RETENTION_DAYS = int(os.environ.get('EXECUTION_RETENTION_DAYS', 90))
+ROLLUP_DAYS = int(os.environ.get('EXECUTION_ROLLUP_DAYS', 2))
+MAINTENANCE_INTERVAL = float(os.environ.get('MAINTENANCE_INTERVAL', 3600))
+# Keeps maintenance runs on several hosts from overlapping
+MAINTENANCE_LOCK_ID = 7413002
+
+PARENT_TABLE = 'workflow_executions'
+DEFAULT_PARTITION = 'workflow_executions_default'
+
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+if PARTITION_INTERVAL not in ('day', 'month'):
+    raise ValueError("EXECUTION_PARTITION_INTERVAL must be 'day' or 'month'")
+
+def period_start(moment):
+    """Start of the partition period containing moment"""
+    day = datetime(moment.year, moment.month, moment.day)
+    return day if PARTITION_INTERVAL == 'day' else day.replace(day=1)
+
+def next_boundary(start):
+    """Upper bound of a partition beginning at start"""
+    if PARTITION_INTERVAL == 'day':
+        return datetime(start.year, start.month, start.day) + timedelta(days=1)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+def list_partitions(conn):
+    """Return [(name, start, end)] for the ranged partitions, oldest first"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass""",
+            (PARENT_TABLE,)
+        )
+        rows = cur.fetchall()
+    partitions = []
+    for row in rows:
+        match = _BOUND.search(row['bound'])
+        if match:
+            partitions.append((row['name'], datetime.fromisoformat(match.group(1)),
+                               datetime.fromisoformat(match.group(2))))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+def _stray_periods(conn):
+    """Starts of the periods that have rows sitting in the default partition"""
+    cur = conn.execute(
+        sql.SQL("SELECT DISTINCT date_trunc({}, started_at) AS start FROM {}").format(
+            sql.Literal(PARTITION_INTERVAL), sql.Identifier(DEFAULT_PARTITION)
+        )
+    )
+    return [row['start'] for row in cur.fetchall()]
+
+def _create_partition(conn, start, end):
+    """Create one partition, moving matching rows out of the default partition
+
+    Postgres refuses to create a partition while the default partition holds
+    rows for its range, so those rows are moved across with the default
+    partition detached, all in one transaction.
+    """
+    name = f"{PARENT_TABLE}_p{start:%Y%m%d}"
+    create = sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})").format(
+        sql.Identifier(name), sql.Identifier(PARENT_TABLE), sql.Literal(start), sql.Literal(end)
+    )
+    in_range = sql.SQL("started_at >= {} AND started_at < {}").format(sql.Literal(start), sql.Literal(end))
+    with conn.transaction():
+        stray = conn.execute(
+            sql.SQL("SELECT EXISTS (SELECT 1 FROM {} WHERE {}) AS stray").format(
+                sql.Identifier(DEFAULT_PARTITION), in_range
+            )
+        ).fetchone()['stray']
+        if not stray:
+            conn.execute(create)
+            return name
+        conn.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+            sql.Identifier(PARENT_TABLE), sql.Identifier(DEFAULT_PARTITION)
+        ))
+        conn.execute(create)
+        moved = conn.execute(sql.SQL("INSERT INTO {} SELECT * FROM {} WHERE {}").format(
+            sql.Identifier(name), sql.Identifier(DEFAULT_PARTITION), in_range
+        )).rowcount
+        conn.execute(sql.SQL("DELETE FROM {} WHERE {}").format(sql.Identifier(DEFAULT_PARTITION), in_range))
+        conn.execute(sql.SQL("ALTER TABLE {} ATTACH PARTITION {} DEFAULT").format(
+            sql.Identifier(PARENT_TABLE), sql.Identifier(DEFAULT_PARTITION)
+        ))
+    logger.info(f"Moved {moved} execution(s) from {DEFAULT_PARTITION} into {name}")
+    return name
+
+def create_partitions(conn, now):
+    """Create partitions up to PARTITIONS_AHEAD periods past the current one,
+    plus any period whose rows ended up in the default partition"""
+    partitions = list_partitions(conn)
+    horizon = period_start(now)
+    for _ in range(PARTITIONS_AHEAD + 1):
+        horizon = next_boundary(horizon)
+
+    periods = set(_stray_periods(conn))
+    start = partitions[-1][2] if partitions else period_start(now)
+    while start < horizon:
+        periods.add(start)
+        start = next_boundary(start)
+
+    created = []
+    for start in sorted(periods):
+        end = next_boundary(start)
+        if any(start < p_end and p_start < end for _, p_start, p_end in partitions):
+            continue
+        created.append(_create_partition(conn, start, end))
+    return created
+
+def rollup(conn, first_day, last_day):
+    """Recompute workflow_daily_stats for days in [first_day, last_day]"""
+    with conn.transaction():
+        cur = conn.execute(
+            """INSERT INTO workflow_daily_stats
+                (workflow_id, day, executions, succeeded, failed, p50_duration_ms, p95_duration_ms, updated_at)
+            SELECT workflow_id, started_at::date, COUNT(*),
+                COUNT(*) FILTER (WHERE status = 'completed'),
+                COUNT(*) FILTER (WHERE status = 'failed'),
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM completed_at - started_at) * 1000),
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM completed_at - started_at) * 1000),
+                LOCALTIMESTAMP
+            FROM workflow_executions
+            WHERE started_at >= %s AND started_at < %s AND workflow_id IS NOT NULL
+            GROUP BY workflow_id, started_at::date
+            ON CONFLICT (workflow_id, day) DO UPDATE
+            SET executions = EXCLUDED.executions, succeeded = EXCLUDED.succeeded, failed = EXCLUDED.failed,
+                p50_duration_ms = EXCLUDED.p50_duration_ms, p95_duration_ms = EXCLUDED.p95_duration_ms,
+                updated_at = EXCLUDED.updated_at""",
+            (first_day, last_day + timedelta(days=1))
+        )
+        return cur.rowcount
+
+def drop_expired_partitions(conn, now):
+    """Roll up and drop partitions that end before the retention cutoff"""
+    cutoff = now - timedelta(days=RETENTION_DAYS)
+    dropped = []
+    for name, start, end in list_partitions(conn):
+        if end > cutoff:
+            break
+        # Final rollup so dashboard history outlives the raw rows
+        rollup(conn, start.date(), (end - timedelta(days=1)).date())
+        with conn.transaction():
+            conn.execute(sql.SQL(
+                "DELETE FROM execution_results r USING {} e WHERE r.execution_id = e.id"
+            ).format(sql.Identifier(name)))
+            conn.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        dropped.append(name)
+    return dropped
+
+def maintain():
+    """Run one maintenance pass; returns a summary, or None if another host is running one"""
+    conn = open_dedicated_connection(autocommit=True)
+    try:
+        if not conn.execute("SELECT pg_try_advisory_lock(%s) AS locked", (MAINTENANCE_LOCK_ID,)).fetchone()['locked']:
+            logger.info("Partition maintenance already running elsewhere")
+            return None
+        try:
+            now = conn.execute("SELECT LOCALTIMESTAMP AS now").fetchone()['now']
+            summary = {
+                'created': create_partitions(conn, now),
+                'rolled_up': rollup(conn, (now - timedelta(days=ROLLUP_DAYS - 1)).date(), now.date()),
+                'dropped': drop_expired_partitions(conn, now)
+            }
+            stray = conn.execute(
+                sql.SQL("SELECT COUNT(*) AS count FROM {}").format(sql.Identifier(DEFAULT_PARTITION))
+            ).fetchone()['count']
+            if stray:
+                # Rows create_partitions could not place, e.g. in a range that
+                # overlaps partitions of another interval
+                logger.error(f"{stray} execution(s) left in {DEFAULT_PARTITION}; retention does not drop them")
+            logger.info(f"Partition maintenance: {summary}")
+            return summary
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (MAINTENANCE_LOCK_ID,))
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='workflow_executions partition maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('maintain', help='create, roll up and drop partitions')
+    rollup_parser = subparsers.add_parser('rollup', help='recompute recent daily rollups')
+    rollup_parser.add_argument('--days', type=int, default=ROLLUP_DAYS)
+    subparsers.add_parser('status', help='list partitions and their ranges')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+
+    if args.command == 'maintain':
+        maintain()
+        return 0
+
+    conn = open_dedicated_connection(autocommit=True)
+    try:
+        if args.command == 'rollup':
+            today = conn.execute("SELECT CURRENT_DATE AS today").fetchone()['today']
+            rows = rollup(conn, today - timedelta(days=args.days - 1), today)
+            print(f"Rolled up {rows} workflow-day(s)")
+        else:
+            for name, start, end in list_partitions(conn):
+                print(f"{name}  {start:%Y-%m-%d} .. {end:%Y-%m-%d}")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import os
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+logger = logging.getLogger(__name__)
+
+# Password hashing runs on a small per-process pool of hashing processes so a
+# burst of logins cannot occupy every request thread with CPU work. At most
+# PASSWORD_HASH_MAX_PENDING hashes may be queued or running per web process;
+# beyond that callers get PasswordHashingBusy, which the API answers with 503.
+# PASSWORD_HASH_WORKERS=0 hashes inline in the request thread.
+HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}')
+SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', max(HASH_WORKERS, 1) * 4))
+HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full or a hash did not finish in time"""
+
+def normalize_method(method):
+    """Spell out werkzeug's implied pbkdf2 iteration count for comparisons"""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        return f"pbkdf2:{parts[1] if len(parts) > 1 else 'sha256'}:{parts[2] if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+def needs_rehash(stored_hash, method=HASH_METHOD):
+    """Whether a stored hash was made with different parameters than method"""
+    return normalize_method(stored_hash.split('$', 1)[0]) != normalize_method(method)
+
+# Run inside the hashing processes
+def _hash(password, method):
+    return generate_password_hash(password, method=method, salt_length=SALT_LENGTH)
+
+def _verify(stored_hash, password, method):
+    """Check a password and, on success, produce an upgraded hash if needed"""
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    if needs_rehash(stored_hash, method):
+        return True, _hash(password, method)
+    return True, None
+
+class HashingPool:
+    """Bounded, fork-aware process pool for password hashing"""
+    def __init__(self, workers=HASH_WORKERS, max_pending=MAX_PENDING, timeout=HASH_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.stats = {'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0}
+
+    def _get_executor(self):
+        pid = os.getpid()
+        with self._lock:
+            if self._executor_pid != pid:
+                # Pending work belonged to the parent process
+                self._executor = None
+                self._pending = 0
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = pid
+            return self._executor
+
+    def _reserve(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise PasswordHashingBusy('Password hashing queue is full')
+            self._pending += 1
+
+    def _release(self, future=None):
+        """Free a slot; called without a future when the submit itself failed"""
+        failed = future is None or future.cancelled() or future.exception() is not None
+        with self._lock:
+            self._pending -= 1
+            self.stats['failed' if failed else 'completed'] += 1
+
+    def run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        executor = self._get_executor()
+        self._reserve()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._discard(executor)
+            raise PasswordHashingBusy('Password hashing pool restarted')
+        # The slot is freed when the work finishes, even if the caller gave up
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.stats['timeouts'] += 1
+            raise PasswordHashingBusy('Password hashing timed out')
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise PasswordHashingBusy('Password hashing pool restarted')
+
+    def _discard(self, executor):
+        """A hashing process died; the next call starts a fresh pool"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, pending=self._pending, workers=self.workers,
+                        max_pending=self.max_pending, method=normalize_method(HASH_METHOD))
+
+hashing_pool = HashingPool()
+
+def hash_password(password, method=HASH_METHOD):
+    return hashing_pool.run(_hash, password, method)
+
+def verify_password(stored_hash, password, method=HASH_METHOD):
+    """Return (matches, new_hash); new_hash is set when the stored one is outdated"""
+    if not stored_hash:
+        return False, None
+    return hashing_pool.run(_verify, stored_hash, password, method)
@@ -0,0 +1,261 @@
+"""Pi payments ledger and reconciler
+
+    python payments.py    # run the reconciler on its own
+
+Web requests only record payments and their state changes; all calls that
+complete or re-check a payment with the Pi API happen here, in batches of
+PAYMENT_BATCH_SIZE with at most PAYMENT_CONCURRENCY calls in flight. Payments
+left in created/approved are re-polled every PAYMENT_STUCK_AFTER seconds.
+The worker supervisor runs the reconciler as one of its processes.
+"""
+import os
+import json
+import math
+import random
+import signal
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from db_pool import get_db_connection, release_db_connection, open_dedicated_connection, close_pool
+from pi_client import pi_client, PiApiError, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'payment_jobs'
+BATCH_SIZE = int(os.environ.get('PAYMENT_BATCH_SIZE', 16))
+CONCURRENCY = int(os.environ.get('PAYMENT_CONCURRENCY', 4))
+MAX_ATTEMPTS = int(os.environ.get('PAYMENT_MAX_ATTEMPTS', 10))
+RETRY_BASE_SECONDS = float(os.environ.get('PAYMENT_RETRY_BASE_SECONDS', 10))
+RETRY_MAX_SECONDS = float(os.environ.get('PAYMENT_RETRY_MAX_SECONDS', 1800))
+STUCK_AFTER_SECONDS = int(os.environ.get('PAYMENT_STUCK_AFTER', 300))
+POLL_INTERVAL = float(os.environ.get('PAYMENT_POLL_INTERVAL', 15))
+
+def worst_case_batch_seconds(batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
+    """Upper bound on one reconcile_batch: every payment makes two Pi calls
+    (complete, then poll) that exhaust their retries"""
+    rounds = math.ceil(batch_size / max(concurrency, 1))
+    return math.ceil(rounds * 2 * pi_client.worst_case_seconds())
+
+# A lease shorter than the slowest possible batch would let a second
+# reconciler claim payments that are still being worked on
+LEASE_SECONDS = int(os.environ.get('PAYMENT_LEASE_SECONDS', worst_case_batch_seconds() + 30))
+if LEASE_SECONDS < worst_case_batch_seconds():
+    logger.warning(f"PAYMENT_LEASE_SECONDS={LEASE_SECONDS} is below the worst-case batch time of "
+                   f"{worst_case_batch_seconds()}s; lower PAYMENT_BATCH_SIZE or the Pi timeouts")
+
+TRANSITIONS = {
+    'created': {'approved', 'completing', 'completed', 'failed'},
+    'approved': {'completing', 'completed', 'failed'},
+    'completing': {'completed', 'failed'},
+    'completed': set(),
+    'failed': set()
+}
+
+class PaymentStateError(Exception):
+    """Raised for a transition the state machine does not allow"""
+
+def record_created(cur, payment_id, user_id, amount, memo, metadata):
+    """Add a payment created through the API; it is re-polled if it stalls"""
+    cur.execute(
+        """INSERT INTO payments (id, user_id, amount, memo, metadata, status, next_attempt_at)
+        VALUES (%s, %s, %s, %s, %s, 'created', LOCALTIMESTAMP + make_interval(secs => %s))
+        ON CONFLICT (id) DO NOTHING""",
+        (payment_id, user_id, amount, memo, json.dumps(metadata, default=str), STUCK_AFTER_SECONDS)
+    )
+
+def request_completion(cur, payment_id, user_id, txid):
+    """Queue a payment for completion and return its ledger row
+
+    Payments started client-side are unknown until now and are inserted.
+    Returns None when the payment belongs to another user.
+    """
+    cur.execute(
+        """INSERT INTO payments (id, user_id, status, txid, next_attempt_at)
+        VALUES (%s, %s, 'completing', %s, LOCALTIMESTAMP)
+        ON CONFLICT (id) DO UPDATE
+        SET status = 'completing', txid = EXCLUDED.txid, next_attempt_at = LOCALTIMESTAMP,
+            updated_at = LOCALTIMESTAMP,
+            -- Polls while the payment sat in created/approved must not use up
+            -- the completion's retry budget
+            attempts = CASE WHEN payments.status = 'completing' THEN payments.attempts ELSE 0 END,
+            last_error = CASE WHEN payments.status = 'completing' THEN payments.last_error ELSE NULL END
+        WHERE payments.user_id = EXCLUDED.user_id AND payments.status IN ('created', 'approved', 'completing')
+        RETURNING id, status, txid""",
+        (payment_id, user_id, txid)
+    )
+    row = cur.fetchone()
+    if row is None:
+        # Already settled, or not this user's payment
+        cur.execute("SELECT id, status, txid FROM payments WHERE id = %s AND user_id = %s", (payment_id, user_id))
+        return cur.fetchone()
+    cur.execute("SELECT pg_notify(%s, '')", (NOTIFY_CHANNEL,))
+    return row
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter for the given attempt number"""
+    ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return random.uniform(ceiling / 2, ceiling)
+
+def claim_batch(conn, limit=BATCH_SIZE):
+    """Lease a batch of due payments; concurrent reconcilers skip each other's rows"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE payments
+            SET attempts = attempts + 1, locked_until = LOCALTIMESTAMP + make_interval(secs => %s)
+            WHERE id IN (
+                SELECT id FROM payments
+                WHERE status IN ('created', 'approved', 'completing')
+                  AND next_attempt_at <= LOCALTIMESTAMP
+                  AND (locked_until IS NULL OR locked_until < LOCALTIMESTAMP)
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, status, txid, attempts""",
+            (LEASE_SECONDS, limit)
+        )
+        batch = cur.fetchall()
+    conn.commit()
+    return batch
+
+def transition(conn, payment, status, delay=0, txid=None, error=None):
+    """Move a claimed payment to status (or keep it there) and release its lease"""
+    if status != payment['status'] and status not in TRANSITIONS[payment['status']]:
+        raise PaymentStateError(f"Payment {payment['id']} cannot go from {payment['status']} to {status}")
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE payments
+            SET status = %s, txid = COALESCE(%s, txid), last_error = %s, locked_until = NULL,
+                next_attempt_at = LOCALTIMESTAMP + make_interval(secs => %s), updated_at = LOCALTIMESTAMP,
+                completed_at = CASE WHEN %s = 'completed' THEN LOCALTIMESTAMP ELSE completed_at END
+            WHERE id = %s AND status = %s""",
+            (status, txid, error, delay, status, payment['id'], payment['status'])
+        )
+    conn.commit()
+
+def _remote_state(remote):
+    """Map a Pi payment document onto a ledger status, or None if still open"""
+    flags = remote.get('status') or {}
+    if flags.get('developer_completed'):
+        return 'completed'
+    if flags.get('cancelled') or flags.get('user_cancelled'):
+        return 'failed'
+    if (remote.get('transaction') or {}).get('txid'):
+        return 'completing'
+    if flags.get('developer_approved'):
+        return 'approved'
+    return None
+
+def _complete(payment):
+    """Complete with the Pi API; returns (status, delay, txid, error)"""
+    try:
+        pi_client.complete_payment(payment['id'], payment['txid'])
+        return 'completed', 0, None, None
+    except CircuitOpenError as e:
+        return 'completing', retry_delay(payment['attempts']), None, str(e)
+    except PiApiError as e:
+        if e.status_code is not None and 400 <= e.status_code < 500 and e.status_code != 429:
+            # The API rejected the call; its view of the payment decides
+            return _poll(payment, fallback_error=f'{e}: {e.body}')
+        if payment['attempts'] >= MAX_ATTEMPTS:
+            return 'failed', 0, None, str(e)
+        return 'completing', retry_delay(payment['attempts']), None, str(e)
+
+def _poll(payment, fallback_error=None):
+    """Re-read a payment from the Pi API; returns (status, delay, txid, error)"""
+    try:
+        remote = pi_client.get_payment(payment['id'])
+    except PiApiError as e:
+        if payment['attempts'] >= MAX_ATTEMPTS:
+            return 'failed', 0, None, str(e)
+        return payment['status'], retry_delay(payment['attempts']), None, str(e)
+
+    state = _remote_state(remote)
+    txid = (remote.get('transaction') or {}).get('txid')
+    if state in ('completed', 'failed'):
+        return state, 0, txid, None if state == 'completed' else fallback_error or 'Cancelled on Pi Network'
+    if state == 'completing':
+        if payment['status'] == 'completing' and fallback_error:
+            return 'failed', 0, txid, fallback_error
+        return 'completing', 0, txid, None
+    if payment['attempts'] >= MAX_ATTEMPTS:
+        return 'failed', 0, None, fallback_error or 'Payment never completed'
+    status = state if state in TRANSITIONS[payment['status']] else payment['status']
+    return status, STUCK_AFTER_SECONDS, None, fallback_error
+
+def reconcile_payment(payment):
+    """Work out the next state of one claimed payment"""
+    if payment['status'] == 'completing' and payment['txid']:
+        return _complete(payment)
+    return _poll(payment)
+
+def _reconcile_safely(payment):
+    """reconcile_payment for the executor: an unexpected error, such as a
+    malformed API response, retries or fails this payment instead of
+    aborting the whole batch"""
+    try:
+        return reconcile_payment(payment)
+    except Exception as e:
+        logger.error(f"Reconciling payment {payment['id']} failed: {e!r}")
+        if payment['attempts'] >= MAX_ATTEMPTS:
+            return 'failed', 0, None, str(e)
+        return payment['status'], retry_delay(payment['attempts']), None, str(e)
+
+def reconcile_batch(executor):
+    """Claim and settle one batch; returns the number of payments handled"""
+    conn = get_db_connection()
+    if not conn:
+        return 0
+    try:
+        batch = claim_batch(conn)
+        for payment, outcome in zip(batch, executor.map(_reconcile_safely, batch)):
+            status, delay, txid, error = outcome
+            try:
+                transition(conn, payment, status, delay, txid, error)
+            except PaymentStateError as e:
+                logger.error(str(e))
+            if status != payment['status']:
+                logger.info(f"Payment {payment['id']}: {payment['status']} -> {status}")
+        return len(batch)
+    except Exception as e:
+        logger.error(f"Payment reconciliation failed: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        release_db_connection(conn)
+
+def reconciler_main():
+    """Entry point of the reconciler process"""
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    executor = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix='payment')
+    listen_conn = None
+    logger.info("Payment reconciler started")
+    while not stopping.is_set():
+        if reconcile_batch(executor) >= BATCH_SIZE:
+            continue
+        try:
+            if listen_conn is None or listen_conn.closed:
+                listen_conn = open_dedicated_connection()
+                listen_conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                continue
+            for _ in listen_conn.notifies(timeout=POLL_INTERVAL, stop_after=1):
+                pass
+        except Exception as e:
+            logger.error(f"Payment reconciler listen connection failed: {e}")
+            if listen_conn is not None:
+                listen_conn.close()
+            listen_conn = None
+            stopping.wait(POLL_INTERVAL)
+
+    if listen_conn is not None:
+        listen_conn.close()
+    executor.shutdown()
+    close_pool()
+    logger.info("Payment reconciler stopped")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    reconciler_main()
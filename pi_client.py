@@ -0,0 +1,225 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Client for the Pi Network platform API. Connections are kept alive in a
+# per-process pool, every call has connect and read timeouts, idempotent calls
+# are retried with jittered backoff, and a circuit breaker fails fast while
+# the API is degraded. PI_API_URL can point at pi_standin.py for local runs.
+PI_API_URL = os.environ.get('PI_API_URL', 'https://api.minepi.com/v2')
+PI_API_KEY = os.environ.get('PI_API_KEY', 'your-pi-api-key')
+CONNECT_TIMEOUT = float(os.environ.get('PI_CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.environ.get('PI_READ_TIMEOUT', 10))
+MAX_RETRIES = int(os.environ.get('PI_MAX_RETRIES', 2))
+RETRY_BASE_SECONDS = float(os.environ.get('PI_RETRY_BASE_SECONDS', 0.2))
+RETRY_MAX_SECONDS = float(os.environ.get('PI_RETRY_MAX_SECONDS', 2))
+POOL_SIZE = int(os.environ.get('PI_POOL_SIZE', 10))
+BREAKER_FAILURES = int(os.environ.get('PI_BREAKER_FAILURES', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('PI_BREAKER_RESET_SECONDS', 30))
+
+# Responses that indicate the API, not the request, is at fault
+RETRYABLE_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+class PiApiError(Exception):
+    """Raised when a Pi API call fails; status_code is None for transport errors"""
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+class CircuitOpenError(PiApiError):
+    """Raised without calling the API while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Opens after consecutive failures; lets one trial call through after a cool-down"""
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Pi API circuit opened after {self._failures} failure(s)")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+class LatencyStats:
+    """Per-operation call counts and latency percentiles over recent calls"""
+    def __init__(self, window=1000):
+        self.window = window
+        self._ops = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, elapsed_ms, ok):
+        with self._lock:
+            op = self._ops.get(operation)
+            if op is None:
+                op = self._ops[operation] = {'calls': 0, 'errors': 0, 'samples': deque(maxlen=self.window)}
+            op['calls'] += 1
+            op['errors'] += 0 if ok else 1
+            op['samples'].append(elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            ops = {name: (op['calls'], op['errors'], sorted(op['samples'])) for name, op in self._ops.items()}
+        result = {}
+        for name, (calls, errors, samples) in ops.items():
+            result[name] = {
+                'calls': calls,
+                'errors': errors,
+                'p50_ms': round(samples[len(samples) // 2], 3) if samples else None,
+                'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3) if samples else None,
+                'max_ms': round(samples[-1], 3) if samples else None
+            }
+        return result
+
+class PiClient:
+    """Pooled, timeout-bounded client for the Pi platform API"""
+    def __init__(self, base_url=PI_API_URL, api_key=PI_API_KEY, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES, pool_size=POOL_SIZE, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyStats()
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        """Return the process-wide session, re-created after a fork"""
+        pid = os.getpid()
+        if self._session is None or self._session_pid != pid:
+            with self._lock:
+                if self._session is None or self._session_pid != pid:
+                    session = requests.Session()
+                    # Retries are handled here, where idempotency is known
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update({'Authorization': f'Key {self.api_key}', 'Content-Type': 'application/json'})
+                    self._session = session
+                    self._session_pid = pid
+        return self._session
+
+    def worst_case_seconds(self):
+        """Longest one call can take: every attempt times out and backs off fully"""
+        return (self.max_retries + 1) * sum(self.timeout) + self.max_retries * RETRY_MAX_SECONDS
+
+    def _backoff(self, attempt):
+        ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _request(self, operation, method, path, idempotent, json=None):
+        """Send a request, retrying transient failures; returns the decoded body
+
+        Non-idempotent calls are only retried when the connection could not be
+        established, since the API cannot have seen the request.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f'Pi API circuit open, {operation} not attempted')
+
+        session = self._get_session()
+        url = f'{self.base_url}{path}'
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            error = None
+            retry_safe = idempotent
+            try:
+                response = session.request(method, url, json=json, timeout=self.timeout)
+            except requests.exceptions.ConnectTimeout as e:
+                error, retry_safe = PiApiError(f'{operation} connect timeout: {e}'), True
+            except requests.exceptions.RequestException as e:
+                error = PiApiError(f'{operation} failed: {e}')
+            except BaseException:
+                # Anything else (a bug, an interrupt) must still end a
+                # half-open trial, or no call would ever be let through again
+                self.latency.record(operation, (time.perf_counter() - started) * 1000, False)
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code in RETRYABLE_STATUSES:
+                    error = PiApiError(f'{operation} returned {response.status_code}',
+                                       response.status_code, response.text)
+            self.latency.record(operation, (time.perf_counter() - started) * 1000, error is None)
+
+            if error is None:
+                self.breaker.record_success()
+                break
+            self.breaker.record_failure()
+            if not retry_safe or attempt >= self.max_retries or not self.breaker.allow():
+                raise error
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+        if not response.ok:
+            # Client errors say nothing about API health and are not retried
+            raise PiApiError(f'{operation} returned {response.status_code}', response.status_code, response.text)
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    def create_payment(self, payment):
+        """Create an app-to-user payment"""
+        return self._request('create_payment', 'POST', '/payments', idempotent=False, json=payment)
+
+    def get_payment(self, payment_id):
+        return self._request('get_payment', 'GET', f'/payments/{payment_id}', idempotent=True)
+
+    def approve_payment(self, payment_id):
+        return self._request('approve_payment', 'POST', f'/payments/{payment_id}/approve', idempotent=True)
+
+    def complete_payment(self, payment_id, txid):
+        # Completing again with the same txid has no further effect
+        return self._request('complete_payment', 'POST', f'/payments/{payment_id}/complete',
+                             idempotent=True, json={'txid': txid})
+
+    def stats(self):
+        return {'circuit': self.breaker.state, 'operations': self.latency.snapshot()}
+
+pi_client = PiClient()
@@ -0,0 +1,118 @@
+"""Local stand-in for the Pi platform API
+
+    python pi_standin.py --port 8765 --latency-ms 200 --error-rate 0.2
+    PI_API_URL=http://127.0.0.1:8765/v2 python app.py
+
+Implements the payment endpoints the app calls with an in-memory store, and
+can inject latency, server errors and hangs to exercise the client's
+timeouts, retries and circuit breaker.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PAYMENT = re.compile(r'^/v2/payments/([^/]+)(?:/(approve|complete))?$')
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = 'PiStandIn/1.0'
+    payments = {}
+    lock = threading.Lock()
+    options = None
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _inject_faults(self):
+        """Apply configured latency and failures; True if a failure was sent"""
+        options = self.options
+        delay = options.latency_ms + random.uniform(0, options.jitter_ms)
+        if options.hang_rate and random.random() < options.hang_rate:
+            delay = options.hang_seconds * 1000
+        time.sleep(delay / 1000)
+        if options.error_rate and random.random() < options.error_rate:
+            self._reply(options.error_status, {'error': 'injected_failure'})
+            return True
+        return False
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self._inject_faults():
+            return
+        match = _PAYMENT.match(self.path)
+        if not match or match.group(2):
+            return self._reply(404, {'error': 'not_found'})
+        with self.lock:
+            payment = self.payments.get(match.group(1))
+        if payment is None:
+            return self._reply(404, {'error': 'payment_not_found'})
+        self._reply(200, payment)
+
+    def do_POST(self):
+        if self._inject_faults():
+            return
+        body = self._body()
+        if self.path == '/v2/payments':
+            payment = dict(body, identifier=uuid.uuid4().hex, status={
+                'developer_approved': False, 'transaction_verified': False, 'developer_completed': False
+            }, transaction=None)
+            with self.lock:
+                self.payments[payment['identifier']] = payment
+            return self._reply(201, payment)
+
+        match = _PAYMENT.match(self.path)
+        if not match or not match.group(2):
+            return self._reply(404, {'error': 'not_found'})
+        with self.lock:
+            # Unknown ids are accepted so client-side payments can be completed too
+            payment = self.payments.setdefault(match.group(1), {
+                'identifier': match.group(1), 'status': {}, 'transaction': None
+            })
+            if match.group(2) == 'approve':
+                payment['status']['developer_approved'] = True
+            else:
+                payment['status']['developer_completed'] = True
+                payment['status']['transaction_verified'] = True
+                payment['transaction'] = {'txid': body.get('txid'), 'verified': True}
+        self._reply(200, payment)
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Pi platform API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of calls answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--hang-rate', type=float, default=0, help='fraction of calls delayed by --hang-seconds')
+    parser.add_argument('--hang-seconds', type=float, default=30)
+    parser.add_argument('--verbose', action='store_true')
+    StandInHandler.options = parser.parse_args()
+
+    server = ThreadingHTTPServer((StandInHandler.options.host, StandInHandler.options.port), StandInHandler)
+    print(f"Pi API stand-in listening on http://{StandInHandler.options.host}:{StandInHandler.options.port}/v2")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""Pi access-token verification
+
+Tokens are JWTs verified against a locally cached key set (JWKS), loaded
+from PI_JWKS_URL or, for local runs and tests, from the file at PI_JWKS_FILE.
+The key set is refreshed in the background every PI_JWKS_REFRESH_SECONDS and
+on demand, rate limited, when a token names an unknown key id. Successful
+verifications are cached by token hash until the token expires, so repeat
+requests cost one dictionary lookup.
+
+A file-based key set and matching tokens can be generated with:
+
+    python pi_tokens.py init-keys ./dev-keys
+    PI_JWKS_FILE=./dev-keys/jwks.json python pi_tokens.py issue ./dev-keys --uid u1 --username alice
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import logging
+import argparse
+import threading
+import jwt
+import requests
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+JWKS_URL = os.environ.get('PI_JWKS_URL')
+JWKS_FILE = os.environ.get('PI_JWKS_FILE')
+JWKS_REFRESH_SECONDS = float(os.environ.get('PI_JWKS_REFRESH_SECONDS', 3600))
+# Lower bound between refreshes triggered by unknown key ids
+JWKS_MIN_REFRESH_SECONDS = float(os.environ.get('PI_JWKS_MIN_REFRESH_SECONDS', 60))
+JWKS_FETCH_TIMEOUT = float(os.environ.get('PI_JWKS_FETCH_TIMEOUT', 5))
+# After a failed load, further loads wait out an exponential backoff between
+# these bounds; verification keeps using the previous keys meanwhile and
+# tokens with unknown key ids are rejected without another fetch
+JWKS_RETRY_BASE_SECONDS = float(os.environ.get('PI_JWKS_RETRY_BASE_SECONDS', 5))
+JWKS_RETRY_MAX_SECONDS = float(os.environ.get('PI_JWKS_RETRY_MAX_SECONDS', 300))
+ALGORITHMS = [alg.strip() for alg in os.environ.get('PI_JWT_ALGORITHMS', 'RS256,ES256').split(',') if alg.strip()]
+AUDIENCE = os.environ.get('PI_JWT_AUDIENCE') or None
+ISSUER = os.environ.get('PI_JWT_ISSUER') or None
+LEEWAY_SECONDS = float(os.environ.get('PI_JWT_LEEWAY', 30))
+TOKEN_CACHE_SIZE = int(os.environ.get('PI_TOKEN_CACHE_SIZE', 10000))
+# Optional cap below the token's own expiry, bounding how long a revoked
+# token keeps working from cache
+TOKEN_CACHE_MAX_TTL = float(os.environ['PI_TOKEN_CACHE_MAX_TTL']) if os.environ.get('PI_TOKEN_CACHE_MAX_TTL') else None
+
+class TokenVerificationError(Exception):
+    """Raised when a token cannot be verified"""
+
+def load_key_set():
+    """Fetch the configured JWKS and return {kid: PyJWK}"""
+    if JWKS_FILE:
+        with open(JWKS_FILE) as f:
+            document = json.load(f)
+    elif JWKS_URL:
+        response = requests.get(JWKS_URL, timeout=JWKS_FETCH_TIMEOUT)
+        response.raise_for_status()
+        document = response.json()
+    else:
+        raise TokenVerificationError('No key set configured; set PI_JWKS_URL or PI_JWKS_FILE')
+
+    keys = {}
+    for jwk in document.get('keys', []):
+        try:
+            keys[jwk.get('kid')] = jwt.PyJWK(jwk)
+        except jwt.PyJWTError as e:
+            logger.warning(f"Skipping unusable key {jwk.get('kid')}: {e}")
+    if not keys:
+        raise TokenVerificationError('Key set contains no usable keys')
+    return keys
+
+class PiTokenVerifier:
+    """Verifies Pi access tokens against a cached, background-refreshed key set"""
+    def __init__(self, key_loader=load_key_set):
+        self.key_loader = key_loader
+        self._keys = {}
+        self._loaded_at = None
+        self._failures = 0
+        self._retry_at = None
+        self._last_error = None
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+        self._verified = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_MAX_TTL)
+
+    def refresh(self, min_age=0):
+        """Reload the key set unless it was loaded less than min_age seconds ago
+
+        Concurrent callers wait for one load instead of each fetching. While
+        the backoff after a failed load is running this raises at once.
+        """
+        with self._refresh_lock:
+            now = time.monotonic()
+            if self._retry_at is not None and now < self._retry_at:
+                raise TokenVerificationError(
+                    f'last load failed ({self._last_error}), next attempt in {self._retry_at - now:.0f}s'
+                )
+            if self._loaded_at is not None and now - self._loaded_at < min_age:
+                return
+            try:
+                keys = self.key_loader()
+            except Exception as e:
+                self._failures += 1
+                self._last_error = e
+                self._retry_at = time.monotonic() + min(
+                    JWKS_RETRY_MAX_SECONDS, JWKS_RETRY_BASE_SECONDS * 2 ** (self._failures - 1)
+                )
+                raise
+            self._keys = keys
+            self._loaded_at = time.monotonic()
+            self._failures = 0
+            self._retry_at = None
+            self._last_error = None
+            logger.info(f"Loaded {len(keys)} Pi token key(s)")
+
+    def _ensure_refresher(self):
+        """Start the background refresher, again in each forked worker"""
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid:
+            return
+        with self._refresh_lock:
+            if self._thread is None or self._thread_pid != pid:
+                self._thread = threading.Thread(target=self._refresh_loop, name='pi-jwks-refresh', daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            # Retry as soon as a failed load's backoff ends
+            retry_at = self._retry_at
+            delay = JWKS_REFRESH_SECONDS if retry_at is None else max(retry_at - time.monotonic(), 0)
+            time.sleep(min(delay, JWKS_REFRESH_SECONDS))
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep verifying with the previous keys
+                logger.error(f"Pi key set refresh failed: {e}")
+
+    def _signing_key(self, kid):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        try:
+            self.refresh(min_age=JWKS_MIN_REFRESH_SECONDS)
+        except Exception as e:
+            raise TokenVerificationError(f'Key set unavailable: {e}')
+        key = self._keys.get(kid)
+        if key is None:
+            raise TokenVerificationError(f'Unknown signing key: {kid}')
+        return key
+
+    def verify(self, token):
+        """Return the token's claims, or raise TokenVerificationError"""
+        if not token:
+            raise TokenVerificationError('Missing token')
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self._verified.get(cache_key)
+        if claims is not None:
+            return claims
+
+        self._ensure_refresher()
+        try:
+            header = jwt.get_unverified_header(token)
+            if header.get('alg') not in ALGORITHMS:
+                raise TokenVerificationError(f"Algorithm not allowed: {header.get('alg')}")
+            signing_key = self._signing_key(header.get('kid'))
+            claims = jwt.decode(
+                token, signing_key.key,
+                algorithms=ALGORITHMS,
+                audience=AUDIENCE,
+                issuer=ISSUER,
+                leeway=LEEWAY_SECONDS,
+                options={'require': ['exp'], 'verify_aud': AUDIENCE is not None}
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e))
+
+        claims.setdefault('uid', claims.get('sub'))
+        ttl = claims['exp'] - time.time()
+        if TOKEN_CACHE_MAX_TTL is not None:
+            ttl = min(ttl, TOKEN_CACHE_MAX_TTL)
+        if ttl > 0:
+            self._verified.set(cache_key, claims, ttl=ttl)
+        return claims
+
+    def stats(self):
+        return {
+            'keys': len(self._keys),
+            'load_failures': self._failures,
+            'last_error': str(self._last_error) if self._last_error else None,
+            'verified_cache': self._verified.stats()
+        }
+
+token_verifier = PiTokenVerifier()
+
+def verify_pi_token(token):
+    """Shared entry point: the verified claims, or None if the token is invalid"""
+    try:
+        return token_verifier.verify(token)
+    except TokenVerificationError as e:
+        logger.info(f"Pi token rejected: {e}")
+        return None
+
+# Local key set stand-in
+def init_keys(directory):
+    """Write an RS256 key pair as jwks.json (public) and signing_key.pem"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    os.makedirs(directory, exist_ok=True)
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    kid = uuid.uuid4().hex[:16]
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({'kid': kid, 'alg': 'RS256', 'use': 'sig'})
+    with open(os.path.join(directory, 'jwks.json'), 'w') as f:
+        json.dump({'keys': [jwk]}, f, indent=2)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    with open(os.path.join(directory, 'signing_key.pem'), 'wb') as f:
+        f.write(pem)
+    os.chmod(os.path.join(directory, 'signing_key.pem'), 0o600)
+    return kid
+
+def issue_token(directory, uid, username, ttl=3600):
+    """Sign a token with a key written by init_keys"""
+    with open(os.path.join(directory, 'jwks.json')) as f:
+        kid = json.load(f)['keys'][0]['kid']
+    with open(os.path.join(directory, 'signing_key.pem')) as f:
+        private_key = f.read()
+    now = int(time.time())
+    claims = {'uid': uid, 'sub': uid, 'username': username, 'iat': now, 'exp': now + ttl}
+    if AUDIENCE:
+        claims['aud'] = AUDIENCE
+    if ISSUER:
+        claims['iss'] = ISSUER
+    return jwt.encode(claims, private_key, algorithm='RS256', headers={'kid': kid})
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Pi token key set stand-in')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    init_parser = subparsers.add_parser('init-keys', help='generate jwks.json and signing_key.pem')
+    init_parser.add_argument('directory')
+    issue_parser = subparsers.add_parser('issue', help='sign a token with the generated key')
+    issue_parser.add_argument('directory')
+    issue_parser.add_argument('--uid', required=True)
+    issue_parser.add_argument('--username', required=True)
+    issue_parser.add_argument('--ttl', type=int, default=3600)
+    args = parser.parse_args()
+
+    if args.command == 'init-keys':
+        kid = init_keys(args.directory)
+        print(f"Wrote key {kid}; set PI_JWKS_FILE={os.path.join(args.directory, 'jwks.json')}")
+    else:
+        print(issue_token(args.directory, args.uid, args.username, args.ttl))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import os
+import gzip
+import tempfile
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:  # .br variants are skipped without the Brotli package
+    brotli = None
+
+# Files are written next to .gz and .br variants so they can be served with
+# sendfile and no compression work on the request path.
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+def _atomic_write(path, data):
+    """Write via a temp file and rename so readers never see partial files"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def write_precompressed(path, data):
+    """Atomically write data plus its gzip and brotli variants"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Compressed variants first, so a fresh identity file never pairs with
+    # stale compressed ones for longer than the last rename
+    _atomic_write(path + '.gz', gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+    if brotli is not None:
+        _atomic_write(path + '.br', brotli.compress(data, quality=BROTLI_QUALITY))
+    _atomic_write(path, data)
+
+def remove_precompressed(path):
+    for variant in (path + '.br', path + '.gz', path):
+        try:
+            os.unlink(variant)
+        except FileNotFoundError:
+            pass
+
+def send_precompressed(path, mimetype, max_age=0, immutable=False):
+    """Send the best precompressed variant the client accepts
+
+    Returns None when the file does not exist so callers can fall back.
+    """
+    encodings = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encodings.quality(encoding) > 0 and os.path.isfile(path + suffix):
+            variant, content_encoding = path + suffix, encoding
+            break
+    else:
+        variant, content_encoding = path, None
+
+    try:
+        response = send_file(variant, mimetype=mimetype, conditional=True, max_age=max_age)
+    except FileNotFoundError:
+        return None
+
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    return response
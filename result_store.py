@@ -0,0 +1,60 @@
+import os
+import json
+import threading
+
+try:
+    import zstandard
+except ImportError:  # payloads are stored uncompressed without zstandard
+    zstandard = None
+
+# Execution results are serialised once to compact JSON and stored in
+# execution_results, compressed with zstd when they exceed the threshold.
+COMPRESS_THRESHOLD = int(os.environ.get('RESULTS_COMPRESS_THRESHOLD', 1024))
+ZSTD_LEVEL = int(os.environ.get('RESULTS_ZSTD_LEVEL', 3))
+
+IDENTITY = 'identity'
+ZSTD = 'zstd'
+
+# zstandard compressor objects must not be shared between threads
+_local = threading.local()
+
+def _compressor():
+    if not hasattr(_local, 'compressor'):
+        _local.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return _local.compressor
+
+def _decompressor():
+    if not hasattr(_local, 'decompressor'):
+        _local.decompressor = zstandard.ZstdDecompressor()
+    return _local.decompressor
+
+def encode_results(results):
+    """Return (encoding, payload bytes, uncompressed size) for a results document"""
+    raw = json.dumps(results, default=str, separators=(',', ':')).encode('utf-8')
+    if zstandard is not None and len(raw) > COMPRESS_THRESHOLD:
+        return ZSTD, _compressor().compress(raw), len(raw)
+    return IDENTITY, raw, len(raw)
+
+def decode_payload(encoding, payload):
+    """Return the JSON bytes of a stored payload"""
+    payload = bytes(payload)
+    if encoding == IDENTITY:
+        return payload
+    if encoding == ZSTD:
+        if zstandard is None:
+            raise RuntimeError('zstandard is required to read compressed results')
+        return _decompressor().decompress(payload)
+    raise ValueError(f'Unknown results encoding: {encoding}')
+
+def store_results(cur, execution_id, workflow_id, results):
+    """Upsert the results of an execution; a retried run replaces earlier ones"""
+    encoding, payload, size = encode_results(results)
+    cur.execute(
+        """INSERT INTO execution_results (execution_id, workflow_id, encoding, size_bytes, stored_bytes, payload)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (execution_id) DO UPDATE
+        SET encoding = EXCLUDED.encoding, size_bytes = EXCLUDED.size_bytes,
+            stored_bytes = EXCLUDED.stored_bytes, payload = EXCLUDED.payload,
+            created_at = CURRENT_TIMESTAMP""",
+        (execution_id, workflow_id, encoding, size, len(payload), payload)
+    )
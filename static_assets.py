@@ -0,0 +1,120 @@
+"""Frontend asset build and lookup
+
+    python static_assets.py build
+
+Minifies the assets index.html references, names each copy after a hash of
+its contents (js1.js -> js1.3f2a9c0e1b7d.js), writes .gz and .br variants next
+to it in STATIC_BUILD_DIR, and writes an index.html that points at the hashed
+names. Hashed files never change, so they are served with immutable caching;
+index.html is revalidated on every load. Files from the previous build are
+kept so pages loaded before a deploy can still fetch their assets.
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+from precompressed import write_precompressed, remove_precompressed
+
+try:
+    import rjsmin
+except ImportError:  # assets are copied unminified without rjsmin/rcssmin
+    rjsmin = None
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.environ.get('STATIC_BUILD_DIR', os.path.join(SOURCE_DIR, 'static_build'))
+STATIC_URL_PREFIX = '/static/'
+MANIFEST_NAME = 'manifest.json'
+INDEX_NAME = 'index.html'
+
+# Frontend files that may be served; the build only processes those that
+# index.html actually references
+ASSET_SOURCES = ('style.css', 'js1.js')
+
+_REFERENCE = re.compile(r'(?P<attr>\b(?:src|href))=(?P<quote>["\'])(?P<path>[^"\']+)(?P=quote)')
+
+def _minify(name, data):
+    if name.endswith('.js') and rjsmin is not None:
+        return rjsmin.jsmin(data.decode('utf-8')).encode('utf-8')
+    if name.endswith('.css') and rcssmin is not None:
+        return rcssmin.cssmin(data.decode('utf-8')).encode('utf-8')
+    return data
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+def load_manifest(build_dir=BUILD_DIR):
+    """Return {source name: hashed name}, or {} when there is no build"""
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+            return json.load(f).get('assets', {})
+    except FileNotFoundError:
+        return {}
+
+def build(source_dir=SOURCE_DIR, build_dir=BUILD_DIR):
+    """Build hashed, precompressed assets and the rewritten index.html"""
+    with open(os.path.join(source_dir, INDEX_NAME), encoding='utf-8') as f:
+        index = f.read()
+    referenced = {match.group('path') for match in _REFERENCE.finditer(index)}
+
+    previous = load_manifest(build_dir)
+    assets = {}
+    for name in ASSET_SOURCES:
+        if name not in referenced:
+            continue
+        with open(os.path.join(source_dir, name), 'rb') as f:
+            data = _minify(name, f.read())
+        assets[name] = hashed_name(name, data)
+        write_precompressed(os.path.join(build_dir, assets[name]), data)
+
+    def rewrite(match):
+        path = match.group('path')
+        if path not in assets:
+            return match.group(0)
+        return f"{match.group('attr')}={match.group('quote')}{STATIC_URL_PREFIX}{assets[path]}{match.group('quote')}"
+
+    write_precompressed(os.path.join(build_dir, INDEX_NAME), _REFERENCE.sub(rewrite, index).encode('utf-8'))
+    with open(os.path.join(build_dir, MANIFEST_NAME), 'w') as f:
+        json.dump({'assets': assets, 'previous': list(previous.values())}, f, indent=2)
+
+    # Prune hashed files older than the previous build
+    keep = set(assets.values()) | set(previous.values())
+    for filename in os.listdir(build_dir):
+        if filename in (INDEX_NAME, MANIFEST_NAME) or filename.startswith('.'):
+            continue
+        base = re.sub(r'\.(gz|br)$', '', filename)
+        if base not in keep and base != INDEX_NAME:
+            remove_precompressed(os.path.join(build_dir, base))
+    return assets
+
+def servable_files(build_dir=BUILD_DIR):
+    """Hashed file names the current and previous builds may reference"""
+    try:
+        with open(os.path.join(build_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return frozenset()
+    return frozenset(manifest.get('assets', {}).values()) | frozenset(manifest.get('previous', []))
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    if len(sys.argv) != 2 or sys.argv[1] != 'build':
+        print(__doc__)
+        return 2
+    if rjsmin is None or rcssmin is None:
+        logger.warning("rjsmin/rcssmin not installed; assets are not minified")
+    for source, target in build().items():
+        size = os.path.getsize(os.path.join(BUILD_DIR, target))
+        print(f"{source} -> {STATIC_URL_PREFIX}{target} ({size} bytes)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import uuid
+import psycopg
+import pytest
+import job_queue
+from db_pool import open_dedicated_connection
+
+class RecordingConnection:
+    """Stand-in connection that records statements and commits in order"""
+    def __init__(self, job=None):
+        self.events = []
+        self.job = job
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.events.append('COMMIT')
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.events.append(' '.join(query.split()))
+
+    def fetchone(self):
+        return self.conn.job
+
+def test_claim_job_fails_expired_final_attempts_in_claim_transaction():
+    conn = RecordingConnection()
+    assert job_queue.claim_job(conn, 'worker-1') is None
+
+    sweep, claim, commit = conn.events
+    assert sweep.startswith('UPDATE workflow_executions SET status = \'failed\'')
+    assert 'attempts >= max_attempts' in sweep
+    assert 'lease_expires_at < LOCALTIMESTAMP' in sweep
+    assert 'FOR UPDATE SKIP LOCKED' in claim
+    assert 'attempts < max_attempts' in claim
+    assert commit == 'COMMIT'
+
+# The database tests use the DB_* settings and call claim_job, which claims a
+# runnable row; point them at a disposable database, never a live one.
+@pytest.fixture
+def db():
+    try:
+        conn = open_dedicated_connection(autocommit=False)
+    except psycopg.OperationalError as e:
+        pytest.skip(f"database unavailable: {e}")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('workflow_executions') AS name")
+            if cur.fetchone()['name'] is None:
+                pytest.skip('schema not migrated')
+        conn.rollback()
+        yield conn
+    finally:
+        conn.close()
+
+def _insert_running(conn, attempts, max_attempts):
+    execution_id = f"test-{uuid.uuid4()}"
+    with conn.cursor() as cur:
+        cur.execute(
+            """INSERT INTO workflow_executions
+                (id, status, started_at, run_after, attempts, max_attempts, locked_by, lease_expires_at)
+            VALUES (%s, 'running', LOCALTIMESTAMP, LOCALTIMESTAMP, %s, %s, 'dead-worker',
+                    LOCALTIMESTAMP - INTERVAL '1 minute')""",
+            (execution_id, attempts, max_attempts)
+        )
+    conn.commit()
+    return execution_id
+
+def _fetch(conn, execution_id):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT status, locked_by, lease_expires_at, completed_at, error_message FROM workflow_executions WHERE id = %s",
+            (execution_id,)
+        )
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+def _delete(conn, *execution_ids):
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM workflow_executions WHERE id = ANY(%s)", (list(execution_ids),))
+    conn.commit()
+
+def test_claim_job_marks_expired_final_attempt_failed(db):
+    exhausted = _insert_running(db, attempts=3, max_attempts=3)
+    try:
+        job_queue.claim_job(db, 'worker-1')
+        row = _fetch(db, exhausted)
+        assert row['status'] == 'failed'
+        assert row['locked_by'] is None
+        assert row['lease_expires_at'] is None
+        assert row['completed_at'] is not None
+        assert row['error_message'] == 'Lease expired on the final attempt'
+    finally:
+        _delete(db, exhausted)
@@ -0,0 +1,70 @@
+import os
+import json
+import hashlib
+
+# Workflow node types are declared once in tool_catalog.json. The file is
+# loaded at import into a registry that both the workflow engine (handlers,
+# config defaults, trigger types) and GET /api/tools read. API responses are
+# serialized up front, per category, together with their ETags.
+CATALOG_PATH = os.environ.get(
+    'TOOL_CATALOG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tool_catalog.json')
+)
+TRIGGER_CATEGORY = 'trigger'
+
+# Keys sent to the editor; the rest is server-side execution detail
+PUBLIC_KEYS = ('id', 'name', 'description', 'category', 'icon', 'config')
+REQUIRED_KEYS = ('id', 'name', 'category')
+
+class CatalogError(ValueError):
+    """Raised when the catalog definition is malformed"""
+
+def _serialize(tools):
+    public = [{key: tool[key] for key in PUBLIC_KEYS if key in tool} for tool in tools]
+    body = json.dumps(public, separators=(',', ':')).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+class ToolCatalog:
+    """Read-only registry of workflow node types"""
+    def __init__(self, tools):
+        self.tools = tuple(tools)
+        self.by_id = {}
+        self.by_category = {}
+        for tool in self.tools:
+            missing = [key for key in REQUIRED_KEYS if not tool.get(key)]
+            if missing:
+                raise CatalogError(f"Catalog entry {tool.get('id')!r} is missing {', '.join(missing)}")
+            if tool['id'] in self.by_id:
+                raise CatalogError(f"Duplicate catalog entry: {tool['id']}")
+            self.by_id[tool['id']] = tool
+            self.by_category.setdefault(tool['category'], []).append(tool)
+
+        self._responses = {None: _serialize(self.tools)}
+        for category, tools in self.by_category.items():
+            self._responses[category] = _serialize(tools)
+        # Unknown categories filter down to nothing, as before
+        self._empty = _serialize(())
+
+    def response(self, category=None):
+        """Serialized JSON body and ETag of the tool list for category"""
+        return self._responses.get(category, self._empty)
+
+    def ids(self, category):
+        return tuple(tool['id'] for tool in self.by_category.get(category, ()))
+
+    def trigger_types(self):
+        return self.ids(TRIGGER_CATEGORY)
+
+    def defaults(self):
+        """{node type: config defaults} for types that declare any"""
+        return {tool['id']: tool['defaults'] for tool in self.tools if tool.get('defaults')}
+
+    def handler_names(self):
+        """{node type: handler name}; types without one are not run server-side"""
+        return {tool['id']: tool['handler'] for tool in self.tools if tool.get('handler')}
+
+def load_catalog(path=CATALOG_PATH):
+    with open(path, encoding='utf-8') as f:
+        return ToolCatalog(json.load(f)['tools'])
+
+catalog = load_catalog()
@@ -0,0 +1,233 @@
+import os
+import json
+from datetime import datetime
+from cache import TTLCache
+from expression_engine import compile_expression, ExpressionError
+from unit_conversion import convert, convert_many, UnitConversionError
+from validators import default_registry, ValidatorError
+
+# Tools are compiled once into executors (parsed field config plus the handler
+# for their type) and cached by (tool id, updated_at), so editing a tool
+# naturally produces a new cache key and stale executors age out of the LRU.
+EXECUTOR_CACHE_SIZE = int(os.environ.get('TOOL_EXECUTOR_CACHE_SIZE', 512))
+
+_executors = TTLCache(maxsize=EXECUTOR_CACHE_SIZE, ttl=None)
+
+def parse_fields_config(fields_config):
+    """fields_config is stored either as a JSON string or as a decoded list"""
+    if not fields_config:
+        return []
+    if isinstance(fields_config, str):
+        return json.loads(fields_config)
+    return fields_config
+
+def _timestamp():
+    return datetime.utcnow().isoformat()
+
+# Handlers receive the compiled executor and the request input
+def _run_form(executor, input_data):
+    # For form tools, just return the submitted data with validation
+    return {
+        'submitted_data': input_data,
+        'message': f'Form "{executor.name}" submitted successfully!',
+        'timestamp': _timestamp()
+    }
+
+def _run_calculator(executor, input_data):
+    expression = input_data.get('expression', '')
+    try:
+        compiled = compile_expression(expression)
+        bindings = input_data.get('bindings')
+        if bindings is not None:
+            # Batch mode: one expression over many variable bindings
+            results = compiled.evaluate_batch(bindings)
+            return {
+                'expression': expression,
+                'results': results,
+                'count': len(results),
+                'message': f'Evaluated {expression} for {len(results)} inputs'
+            }
+        result = compiled.evaluate(input_data.get('variables') or {})
+        return {
+            'expression': expression,
+            'result': result,
+            'message': f'Calculation completed: {expression} = {result}'
+        }
+    except ExpressionError as e:
+        return {'error': f'Calculation error: {str(e)}'}
+
+def _run_converter(executor, input_data):
+    from_unit = input_data.get('from_unit')
+    to_unit = input_data.get('to_unit')
+
+    try:
+        if 'values' in input_data:
+            # Bulk mode: convert a whole list in one vectorized operation
+            results = [round(result, 4) for result in convert_many(input_data['values'], from_unit, to_unit)]
+            return {
+                'from_unit': from_unit,
+                'to_unit': to_unit,
+                'converted_values': results,
+                'count': len(results),
+                'message': f'Converted {len(results)} values from {from_unit} to {to_unit}'
+            }
+        value = float(input_data.get('value', 0))
+        result = round(convert(value, from_unit, to_unit), 4)
+    except (UnitConversionError, TypeError, ValueError) as e:
+        return {'error': f'Conversion error: {str(e)}'}
+
+    return {
+        'original_value': value,
+        'from_unit': from_unit,
+        'to_unit': to_unit,
+        'converted_value': result,
+        'message': f'Converted {value} {from_unit} to {result} {to_unit}'
+    }
+
+def _run_generator(executor, input_data):
+    template = input_data.get('template', 'Hello, {name}!')
+    variables = input_data.get('variables', {})
+
+    try:
+        generated_text = template.format(**variables)
+        return {
+            'template': template,
+            'variables': variables,
+            'generated_text': generated_text,
+            'message': 'Text generated successfully!'
+        }
+    except Exception as e:
+        return {'error': f'Generation error: {str(e)}'}
+
+def _run_survey(executor, input_data):
+    return {
+        'responses': input_data.get('responses', {}),
+        'rating': input_data.get('rating', 0),
+        'message': 'Survey completed! Thank you for your feedback.',
+        'timestamp': _timestamp()
+    }
+
+def _run_quiz(executor, input_data):
+    answers = input_data.get('answers', {})
+    correct_answers = input_data.get('correct_answers', {})
+
+    total = len(correct_answers)
+    score = sum(1 for question, correct in correct_answers.items() if answers.get(question) == correct)
+    percentage = (score / total * 100) if total > 0 else 0
+
+    return {
+        'score': score,
+        'total': total,
+        'percentage': round(percentage, 1),
+        'message': f'Quiz completed! You scored {score}/{total} ({percentage:.1f}%)',
+        'timestamp': _timestamp()
+    }
+
+def _run_poll(executor, input_data):
+    vote = input_data.get('vote', '')
+    return {
+        'vote': vote,
+        'voter_id': input_data.get('voter_id', 'anonymous'),
+        'message': f'Thank you for voting for: {vote}',
+        'timestamp': _timestamp()
+    }
+
+def _run_scheduler(executor, input_data):
+    event_name = input_data.get('event_name', '')
+    event_date = input_data.get('event_date', '')
+    event_time = input_data.get('event_time', '')
+    return {
+        'event_name': event_name,
+        'event_date': event_date,
+        'event_time': event_time,
+        'attendees': input_data.get('attendees', []),
+        'message': f'Event "{event_name}" scheduled for {event_date} at {event_time}',
+        'timestamp': _timestamp()
+    }
+
+def _run_tracker(executor, input_data):
+    activity = input_data.get('activity', '')
+    value = input_data.get('value', 0)
+    unit = input_data.get('unit', '')
+    return {
+        'activity': activity,
+        'value': value,
+        'unit': unit,
+        'notes': input_data.get('notes', ''),
+        'message': f'Tracked: {value} {unit} for {activity}',
+        'timestamp': _timestamp()
+    }
+
+def _compile_validator(fields):
+    """Built-in validators plus custom patterns from fields_config"""
+    return default_registry.with_custom(fields)
+
+def _run_validator(executor, input_data):
+    data_to_validate = input_data.get('data', '')
+    validation_type = input_data.get('type', 'email')
+
+    try:
+        validator = executor.context.get(validation_type)
+    except ValidatorError:
+        return {
+            'data': data_to_validate,
+            'validation_type': validation_type,
+            'is_valid': False,
+            'message': 'Unknown validation type'
+        }
+    try:
+        return validator.validate(data_to_validate)
+    except ValidatorError as e:
+        return {'error': str(e)}
+
+TOOL_HANDLERS = {
+    'form': _run_form,
+    'calculator': _run_calculator,
+    'converter': _run_converter,
+    'generator': _run_generator,
+    'survey': _run_survey,
+    'quiz': _run_quiz,
+    'poll': _run_poll,
+    'scheduler': _run_scheduler,
+    'tracker': _run_tracker,
+    'validator': _run_validator
+}
+
+# Per-type compile hooks build state that handlers reuse on every call
+TOOL_COMPILERS = {
+    'validator': _compile_validator
+}
+
+class ToolExecutor:
+    """A tool compiled for repeated execution"""
+    __slots__ = ('tool_id', 'name', 'tool_type', 'fields', 'handler', 'context')
+
+    def __init__(self, tool):
+        self.tool_id = tool.id
+        self.name = tool.name
+        self.tool_type = tool.tool_type
+        self.fields = parse_fields_config(tool.fields_config)
+        self.handler = TOOL_HANDLERS.get(tool.tool_type)
+        compiler = TOOL_COMPILERS.get(tool.tool_type)
+        self.context = compiler(self.fields) if compiler else None
+
+    def execute(self, input_data):
+        if self.handler is None:
+            return {'error': f'Unknown tool type: {self.tool_type}'}
+        return self.handler(self, input_data)
+
+def get_executor(tool_id, updated_at, load_tool):
+    """Return the cached executor for a tool version, compiling it on a miss
+
+    load_tool is only called on a miss, so callers that already know the
+    tool's updated_at can skip loading the full row for hot tools.
+    """
+    key = (tool_id, updated_at)
+    executor = _executors.get(key)
+    if executor is None:
+        executor = ToolExecutor(load_tool())
+        _executors.set(key, executor)
+    return executor
+
+def executor_cache_stats():
+    return _executors.stats()
@@ -0,0 +1,91 @@
+import os
+import hashlib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from cache import TTLCache
+from precompressed import write_precompressed, remove_precompressed
+from tool_executors import parse_fields_config
+from unit_conversion import units_by_dimension
+
+# Public tool pages are rendered from templates compiled once at import and
+# cached by (tool id, updated_at). The ETag is derived from the same key plus
+# a digest of the templates, so revalidation never needs a render.
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+PAGE_CACHE_SIZE = int(os.environ.get('TOOL_PAGE_CACHE_SIZE', 1024))
+PAGE_MAX_AGE = int(os.environ.get('TOOL_PAGE_MAX_AGE', 60))
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False
+)
+
+def _load_templates():
+    """Compile every page template up front and fingerprint their sources"""
+    digest = hashlib.sha256()
+    names = ['tool_page.html'] + sorted(
+        f'tool_forms/{name}' for name in os.listdir(os.path.join(TEMPLATE_DIR, 'tool_forms'))
+        if name.endswith('.html')
+    )
+    for name in names:
+        source, _, _ = _env.loader.get_source(_env, name)
+        digest.update(name.encode() + b'\0' + source.encode())
+        _env.get_template(name)
+    form_types = {name[len('tool_forms/'):-len('.html')] for name in names[1:]}
+    return digest.hexdigest()[:16], form_types
+
+TEMPLATE_VERSION, FORM_TYPES = _load_templates()
+_page_template = _env.get_template('tool_page.html')
+_pages = TTLCache(maxsize=PAGE_CACHE_SIZE, ttl=None)
+
+# Converter selects are generated from the unit table the engine uses
+_UNIT_GROUPS = units_by_dimension()
+_DEFAULT_UNITS = {'from_unit': 'celsius', 'to_unit': 'fahrenheit'}
+
+def page_etag(tool_id, updated_at):
+    key = f'{TEMPLATE_VERSION}:{tool_id}:{updated_at}'
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def render_tool_page(tool):
+    """Render the standalone HTML page for a tool"""
+    form_type = tool.tool_type if tool.tool_type in FORM_TYPES else 'unsupported'
+    return _page_template.render(
+        tool=tool,
+        form_template=f'tool_forms/{form_type}.html',
+        fields=parse_fields_config(tool.fields_config),
+        unit_groups=_UNIT_GROUPS,
+        default_units=_DEFAULT_UNITS
+    )
+
+def get_tool_page(tool_id, updated_at, load_tool):
+    """Return the encoded page for a tool version, rendering it on a miss"""
+    key = (tool_id, updated_at)
+    body = _pages.get(key)
+    if body is None:
+        body = render_tool_page(load_tool()).encode('utf-8')
+        _pages.set(key, body)
+    return body
+
+def page_cache_stats():
+    return _pages.stats()
+
+# Published pages are also written to disk at publish time so /tool/<id> can
+# be served with sendfile without touching the database. Each web host needs
+# its own copy (or a shared volume) for this fast path to hit.
+STATIC_PAGES_DIR = os.environ.get(
+    'TOOL_STATIC_PAGES_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'published_pages')
+)
+
+def static_page_path(tool_id):
+    return os.path.join(STATIC_PAGES_DIR, f'{int(tool_id)}.html')
+
+def write_static_page(tool):
+    """Render a published tool and atomically replace its static artifacts"""
+    body = render_tool_page(tool).encode('utf-8')
+    write_precompressed(static_page_path(tool.id), body)
+    _pages.set((tool.id, tool.updated_at), body)
+
+def remove_static_page(tool_id):
+    remove_precompressed(static_page_path(tool_id))
@@ -0,0 +1,86 @@
+try:
+    import numpy as np
+except ImportError:  # array conversions fall back to a list comprehension
+    np = None
+
+class UnitConversionError(ValueError):
+    """Raised for unknown units or units of different dimensions"""
+
+# Declarative unit table: every unit maps to its dimension's base unit with
+# base = value * factor + offset. Offsets are only needed for temperatures.
+UNIT_TABLE = {
+    'temperature': {
+        'kelvin': (1.0, 0.0),
+        'celsius': (1.0, 273.15),
+        'fahrenheit': (5 / 9, 273.15 - 32 * 5 / 9)
+    },
+    'length': {
+        'meters': (1.0, 0.0),
+        'millimeters': (0.001, 0.0),
+        'centimeters': (0.01, 0.0),
+        'kilometers': (1000.0, 0.0),
+        'inches': (0.0254, 0.0),
+        'feet': (0.3048, 0.0),
+        'yards': (0.9144, 0.0),
+        'miles': (1609.344, 0.0)
+    },
+    'weight': {
+        'kilograms': (1.0, 0.0),
+        'grams': (0.001, 0.0),
+        'ounces': (0.028349523125, 0.0),
+        'pounds': (0.45359237, 0.0),
+        'stones': (6.35029318, 0.0)
+    }
+}
+
+def _build_conversions(table):
+    """Precompute one affine (scale, shift) per ordered unit pair
+
+    Going through the base unit, from -> to collapses to
+    to = value * (f1 / f2) + (o1 - o2) / f2, so every conversion is a single
+    multiply-add regardless of how the table is organised.
+    """
+    dimensions = {}
+    conversions = {}
+    for dimension, units in table.items():
+        for unit in units:
+            if unit in dimensions:
+                raise ValueError(f'Unit {unit} defined in more than one dimension')
+            dimensions[unit] = dimension
+        for from_unit, (f1, o1) in units.items():
+            for to_unit, (f2, o2) in units.items():
+                conversions[(from_unit, to_unit)] = (f1 / f2, (o1 - o2) / f2)
+    return dimensions, conversions
+
+UNIT_DIMENSIONS, CONVERSIONS = _build_conversions(UNIT_TABLE)
+
+def conversion_for(from_unit, to_unit):
+    """Return the (scale, shift) pair converting from_unit to to_unit"""
+    for unit in (from_unit, to_unit):
+        if unit not in UNIT_DIMENSIONS:
+            raise UnitConversionError(f'Unknown unit: {unit}')
+    if UNIT_DIMENSIONS[from_unit] != UNIT_DIMENSIONS[to_unit]:
+        raise UnitConversionError(
+            f'Cannot convert {UNIT_DIMENSIONS[from_unit]} ({from_unit}) '
+            f'to {UNIT_DIMENSIONS[to_unit]} ({to_unit})'
+        )
+    return CONVERSIONS[(from_unit, to_unit)]
+
+def convert(value, from_unit, to_unit):
+    scale, shift = conversion_for(from_unit, to_unit)
+    return float(value) * scale + shift
+
+def convert_many(values, from_unit, to_unit):
+    """Convert a sequence of values in one vectorized operation"""
+    scale, shift = conversion_for(from_unit, to_unit)
+    if np is None:
+        return [float(value) * scale + shift for value in values]
+    try:
+        array = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise UnitConversionError('Values must be numeric')
+    return (array * scale + shift).tolist()
+
+def units_by_dimension():
+    """Unit names grouped by dimension, e.g. for building select options"""
+    return {dimension: list(units) for dimension, units in UNIT_TABLE.items()}
@@ -0,0 +1,100 @@
+import os
+import regex
+
+class ValidatorError(ValueError):
+    """Raised for unknown validators, invalid custom patterns or runaway matches"""
+
+# Custom patterns come from tool owners, and a short pattern such as (a+)+$
+# can backtrack for minutes on a short input. Patterns are therefore matched
+# with the regex module, which aborts a match after VALIDATOR_MATCH_TIMEOUT
+# seconds; the length cap only bounds compile cost.
+MAX_CUSTOM_PATTERN_LENGTH = 200
+MATCH_TIMEOUT = float(os.environ.get('VALIDATOR_MATCH_TIMEOUT', 0.1))
+
+class Validator:
+    """A named, precompiled validation pattern"""
+    __slots__ = ('name', 'label', 'pattern')
+
+    def __init__(self, name, pattern, label=None):
+        self.name = name
+        self.label = label or name
+        try:
+            self.pattern = regex.compile(pattern)
+        except regex.error as e:
+            raise ValidatorError(f'Invalid pattern for {name}: {e}')
+
+    def is_valid(self, value):
+        if not isinstance(value, str):
+            return False
+        try:
+            return self.pattern.match(value, timeout=MATCH_TIMEOUT) is not None
+        except TimeoutError:
+            raise ValidatorError(f'{self.label} pattern took too long to match')
+
+    def validate(self, value):
+        is_valid = self.is_valid(value)
+        return {
+            'data': value,
+            'validation_type': self.name,
+            'is_valid': is_valid,
+            'message': f'{self.label} is {"valid" if is_valid else "invalid"}'
+        }
+
+class ValidatorRegistry:
+    """Validators by name; tools derive their own registry with custom ones"""
+    def __init__(self, validators=None):
+        self._validators = dict(validators or {})
+
+    def register(self, name, pattern, label=None):
+        self._validators[name] = Validator(name, pattern, label)
+        return self._validators[name]
+
+    def get(self, name):
+        try:
+            return self._validators[name]
+        except KeyError:
+            raise ValidatorError(f'Unknown validation type: {name}')
+
+    def names(self):
+        return list(self._validators)
+
+    def with_custom(self, fields):
+        """Return a copy extended with validators defined in fields_config
+
+        A field defines a validator when it has a 'pattern'; it is registered
+        under the field's id, e.g. {"id": "zip", "label": "ZIP code",
+        "pattern": "^\\\\d{5}$"}.
+        """
+        registry = ValidatorRegistry(self._validators)
+        for field in fields:
+            if not isinstance(field, dict) or not field.get('pattern') or not field.get('id'):
+                continue
+            if len(field['pattern']) > MAX_CUSTOM_PATTERN_LENGTH:
+                raise ValidatorError(f"Pattern for {field['id']} longer than {MAX_CUSTOM_PATTERN_LENGTH} characters")
+            registry.register(field['id'], field['pattern'], field.get('label'))
+        return registry
+
+default_registry = ValidatorRegistry()
+default_registry.register('email', r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', 'Email address')
+default_registry.register('phone', r'^\+?1?-?\.?\s?\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})$', 'Phone number')
+default_registry.register('url', r'^https?:\/\/(www\.)?[-a-zA-Z0-9@:%._\+~#=]{1,256}\.[a-zA-Z0-9()]{1,6}\b([-a-zA-Z0-9()@:%_\+.~#?&//=]*)$', 'URL')
+
+def validate_stream(values, validator, chunk_size=1000):
+    """Validate an iterable of values lazily, yielding lists of row results
+
+    Only one chunk of results is held at a time, so arbitrarily large inputs
+    are processed in bounded memory. The final item yielded is a summary dict.
+    """
+    total = valid = 0
+    chunk = []
+    for row, value in enumerate(values):
+        is_valid = validator.is_valid(value)
+        total += 1
+        valid += is_valid
+        chunk.append({'row': row, 'data': value, 'is_valid': is_valid})
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+    yield {'total': total, 'valid': valid, 'invalid': total - valid, 'validation_type': validator.name}
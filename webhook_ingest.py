@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from db_pool import get_db_connection, release_db_connection
+from job_queue import MAX_ATTEMPTS, notify_workers
+
+logger = logging.getLogger(__name__)
+
+# Group commit for webhook-triggered executions: rows submitted by request
+# threads are collected for up to WEBHOOK_BATCH_MAX_WAIT_MS (or until
+# WEBHOOK_BATCH_MAX_SIZE rows) and written with one COPY and one commit.
+# Batches only form when a process serves requests concurrently (threaded or
+# gevent workers); with sync workers every batch holds a single row.
+#
+# Rows wait in a queue of at most WEBHOOK_QUEUE_MAX entries. When it is full,
+# or a row is not committed within WEBHOOK_SUBMIT_TIMEOUT, the sender gets a
+# 503 and retries. A sender that passes an Idempotency-Key gets the same
+# execution id on every retry, and the row is written at most once.
+BATCH_ENABLED = os.environ.get('WEBHOOK_BATCH_ENABLED', 'true').lower() == 'true'
+BATCH_MAX_SIZE = int(os.environ.get('WEBHOOK_BATCH_MAX_SIZE', 500))
+BATCH_MAX_WAIT_MS = float(os.environ.get('WEBHOOK_BATCH_MAX_WAIT_MS', 5))
+SUBMIT_TIMEOUT = float(os.environ.get('WEBHOOK_SUBMIT_TIMEOUT', 10))
+QUEUE_MAX = int(os.environ.get('WEBHOOK_QUEUE_MAX', 4 * BATCH_MAX_SIZE))
+RETRY_AFTER_SECONDS = int(os.environ.get('WEBHOOK_RETRY_AFTER', 5))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+class IngestUnavailable(Exception):
+    """The execution could not be recorded promptly; the sender should retry"""
+
+def new_execution_id(workflow_id, idempotency_key=None):
+    """Random execution id, or one derived from the sender's idempotency key"""
+    if idempotency_key is None:
+        return f"exec-{uuid.uuid4().hex}"
+    return f"exec-{uuid.uuid5(uuid.NAMESPACE_URL, f'webhook:{workflow_id}:{idempotency_key}').hex}"
+
+def write_execution_rows(rows):
+    """Write queued execution rows in one transaction
+
+    Rows are (execution_id, workflow_id, input_json, idempotent). Plain rows
+    go in with one COPY; idempotent rows are inserted only if no execution
+    with their id exists yet. started_at and run_after come from the
+    database clock, as in enqueue_execution.
+    """
+    plain = [row for row in rows if not row[3]]
+    idempotent = sorted((row for row in rows if row[3]), key=lambda row: row[0])
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError('Database connection failed')
+    try:
+        with conn.cursor() as cur:
+            if plain:
+                with cur.copy(
+                    "COPY workflow_executions (id, workflow_id, status, input_data, max_attempts) FROM STDIN"
+                ) as copy:
+                    for execution_id, workflow_id, input_json, _ in plain:
+                        copy.write_row((execution_id, workflow_id, 'queued', input_json, MAX_ATTEMPTS))
+            if idempotent:
+                # The primary key includes started_at, so it cannot reject a
+                # retried id; serialize writers of the same id instead. Locks
+                # are taken in id order so concurrent batches cannot deadlock.
+                cur.executemany(
+                    "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                    [(row[0],) for row in idempotent]
+                )
+                cur.executemany(
+                    """INSERT INTO workflow_executions (id, workflow_id, status, started_at, run_after, input_data, max_attempts)
+                    SELECT %s, %s, 'queued', LOCALTIMESTAMP, LOCALTIMESTAMP, %s, %s
+                    WHERE NOT EXISTS (SELECT 1 FROM workflow_executions WHERE id = %s)""",
+                    [(execution_id, workflow_id, input_json, MAX_ATTEMPTS, execution_id)
+                     for execution_id, workflow_id, input_json, _ in idempotent]
+                )
+            notify_workers(cur)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+
+class WebhookBatcher:
+    """Buffers webhook executions and flushes them in durable batches"""
+    def __init__(self, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue(QUEUE_MAX)
+        self._thread = None
+        self._thread_pid = None
+        self._lock = threading.Lock()
+        self.stats = {'batches': 0, 'rows': 0, 'max_batch': 0, 'failures': 0, 'rejected': 0, 'withdrawn': 0}
+
+    def _ensure_thread(self):
+        """Start the flusher thread, again in each forked worker"""
+        pid = os.getpid()
+        if self._thread is not None and self._thread_pid == pid:
+            return
+        with self._lock:
+            if self._thread is None or self._thread_pid != pid:
+                self._queue = queue.Queue(QUEUE_MAX)
+                self._thread = threading.Thread(target=self._run, name='webhook-flusher', daemon=True)
+                self._thread_pid = pid
+                self._thread.start()
+
+    def submit(self, execution_id, workflow_id, input_data, idempotent=False):
+        """Queue one execution row; the Future resolves after it is committed
+
+        Raises IngestUnavailable when the queue is full. Cancelling the
+        Future before its batch is written withdraws the row.
+        """
+        self._ensure_thread()
+        future = Future()
+        row = (execution_id, workflow_id, json.dumps(input_data, default=str), idempotent)
+        try:
+            self._queue.put_nowait((row, future))
+        except queue.Full:
+            self.stats['rejected'] += 1
+            raise IngestUnavailable(f'Webhook queue is full ({QUEUE_MAX} rows)')
+        return future
+
+    def _collect(self):
+        """Block for the first row, then gather more until size or time runs out"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Rows whose request gave up waiting were cancelled; skip them
+            batch = [(row, future) for row, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                write_execution_rows([row for row, _ in batch])
+            except Exception as e:
+                logger.error(f"Webhook batch of {len(batch)} failed: {e}")
+                self.stats['failures'] += 1
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    # One bad row (e.g. a workflow deleted meanwhile) must not
+                    # fail its neighbours, so retry the rows one by one
+                    for row, future in batch:
+                        self._write_single(row, future)
+                continue
+            self.stats['batches'] += 1
+            self.stats['rows'] += len(batch)
+            self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+            for row, future in batch:
+                future.set_result(row[0])
+
+    def _write_single(self, row, future):
+        try:
+            write_execution_rows([row])
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(row[0])
+
+webhook_batcher = WebhookBatcher()
+
+def _report_late_outcome(execution_id, future):
+    """Log what happened to a row whose request already got a 503"""
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Webhook execution {execution_id} failed after its request timed out: {error}")
+    else:
+        logger.warning(f"Webhook execution {execution_id} was committed after its request timed out")
+
+def ingest_webhook_execution(execution_id, workflow_id, input_data, idempotent=False):
+    """Durably record a webhook execution, batched with concurrent hooks
+
+    Raises IngestUnavailable when the row cannot be committed within
+    SUBMIT_TIMEOUT. If it was still waiting in the queue it is withdrawn;
+    if its batch was already being written the outcome is logged when it
+    lands, and a retry with the same idempotency key will not duplicate it.
+    """
+    if BATCH_ENABLED:
+        future = webhook_batcher.submit(execution_id, workflow_id, input_data, idempotent)
+        try:
+            return future.result(timeout=SUBMIT_TIMEOUT)
+        except FutureTimeoutError:
+            if future.cancel():
+                webhook_batcher.stats['withdrawn'] += 1
+            else:
+                future.add_done_callback(lambda done: _report_late_outcome(execution_id, done))
+            raise IngestUnavailable(f'Execution {execution_id} not committed within {SUBMIT_TIMEOUT}s')
+
+    write_execution_rows([(execution_id, workflow_id, json.dumps(input_data, default=str), idempotent)])
+    return execution_id
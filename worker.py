@@ -0,0 +1,203 @@
+"""Background workflow worker
+
+Runs queued workflow executions outside the web tier:
+
+    python worker.py --processes 4
+
+Each process claims jobs from workflow_executions, keeps its lease alive with
+heartbeats while the workflow runs, and sleeps on LISTEN workflow_jobs when
+the queue is empty so new work is picked up as soon as it is committed.
+"""
+import os
+import time
+import signal
+import socket
+import logging
+import argparse
+import threading
+import multiprocessing
+from db_pool import get_db_connection, release_db_connection, open_dedicated_connection, close_pool
+from migrate import ensure_schema
+from job_queue import NOTIFY_CHANNEL, LEASE_SECONDS, claim_job, heartbeat, complete_job, fail_job
+from partitions import MAINTENANCE_INTERVAL, maintain
+from payments import reconciler_main
+from workflow_engine import run_plan, run_workflow, is_current_plan, WorkflowGraphError, NodeExecutionError
+
+logger = logging.getLogger('worker')
+
+# Safety-net poll for retries whose backoff expired and leases that lapsed,
+# neither of which produces a NOTIFY.
+POLL_INTERVAL = float(os.environ.get('WORKER_POLL_INTERVAL', 5))
+# One payment reconciler per supervisor; disable on all but one worker host
+# if payment API concurrency must stay low
+PAYMENT_RECONCILER_ENABLED = os.environ.get('PAYMENT_RECONCILER_ENABLED', 'true').lower() == 'true'
+
+class LeaseKeeper(threading.Thread):
+    """Extend a job's lease in the background while it runs"""
+    def __init__(self, job, worker_id):
+        super().__init__(daemon=True)
+        self.job = job
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(LEASE_SECONDS / 3):
+            conn = get_db_connection()
+            if not conn:
+                continue
+            try:
+                if not heartbeat(conn, self.job, self.worker_id):
+                    logger.warning(f"Lost lease on {self.job['id']}")
+                    return
+            except Exception as e:
+                logger.error(f"Heartbeat failed for {self.job['id']}: {e}")
+            finally:
+                release_db_connection(conn)
+
+    def stop(self):
+        self.stopped.set()
+
+def process_next_job(worker_id):
+    """Claim and run one job; returns False when there was nothing to do"""
+    conn = get_db_connection()
+    if not conn:
+        time.sleep(POLL_INTERVAL)
+        return False
+
+    job = None
+    try:
+        job = claim_job(conn, worker_id)
+        if not job:
+            return False
+
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, nodes, connections, execution_plan FROM workflows WHERE id = %s",
+                (job['workflow_id'],)
+            )
+            workflow = cur.fetchone()
+        # Don't sit idle in a transaction while the workflow runs
+        conn.commit()
+        if not workflow:
+            fail_job(conn, job, worker_id, 'Workflow no longer exists', retryable=False)
+            return True
+
+        keeper = LeaseKeeper(job, worker_id)
+        keeper.start()
+        try:
+            # Workflows saved before plans existed are compiled on the fly
+            if is_current_plan(workflow['execution_plan']):
+                results = run_plan(workflow['execution_plan'], job['input_data'])
+            else:
+                results = run_workflow(workflow['nodes'], workflow['connections'], job['input_data'])
+        except WorkflowGraphError as e:
+            fail_job(conn, job, worker_id, str(e), retryable=False)
+        except NodeExecutionError as e:
+            status = fail_job(conn, job, worker_id, str(e))
+            logger.info(f"Execution {job['id']} attempt {job['attempts']} failed, now {status}")
+        except Exception as e:
+            logger.exception(f"Execution {job['id']} crashed")
+            fail_job(conn, job, worker_id, f'Internal error: {e}')
+        else:
+            complete_job(conn, job, worker_id, results)
+        finally:
+            keeper.stop()
+        return True
+    except Exception as e:
+        logger.error(f"Worker {worker_id} job processing failed: {e}")
+        conn.rollback()
+        if job is not None:
+            # Release the job now rather than leaving it to its lease expiring
+            try:
+                fail_job(conn, job, worker_id, f'Internal error: {e}')
+            except Exception as fail_error:
+                logger.error(f"Could not release execution {job['id']}: {fail_error}")
+                conn.rollback()
+        return job is not None
+    finally:
+        release_db_connection(conn)
+
+def worker_main():
+    """Entry point of a single worker process"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    listen_conn = None
+    logger.info(f"Worker {worker_id} started")
+    while not stopping.is_set():
+        if process_next_job(worker_id):
+            continue
+        try:
+            if listen_conn is None or listen_conn.closed:
+                listen_conn = open_dedicated_connection()
+                listen_conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # A job may have been committed before LISTEN took effect
+                continue
+            for _ in listen_conn.notifies(timeout=POLL_INTERVAL, stop_after=1):
+                pass
+        except Exception as e:
+            logger.error(f"Worker {worker_id} listen connection failed: {e}")
+            if listen_conn is not None:
+                listen_conn.close()
+            listen_conn = None
+            stopping.wait(POLL_INTERVAL)
+
+    if listen_conn is not None:
+        listen_conn.close()
+    close_pool()
+    logger.info(f"Worker {worker_id} stopped")
+
+def run_maintenance():
+    """Entry point of the periodic partition maintenance process"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        maintain()
+    except Exception as e:
+        logger.error(f"Partition maintenance failed: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background workflow workers')
+    parser.add_argument('--processes', type=int, default=int(os.environ.get('WORKER_PROCESSES', 2)),
+                        help='number of worker processes to run')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(levelname)s %(message)s')
+    ensure_schema()
+    # Children open their own pools
+    close_pool()
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    processes = []
+    reconciler = None
+    maintenance = None
+    next_maintenance = time.monotonic()
+    while not stopping.is_set():
+        # Start missing workers and replace any that exited unexpectedly
+        processes = [p for p in processes if p.is_alive()]
+        while len(processes) < args.processes:
+            process = multiprocessing.Process(target=worker_main, name=f'worker-{len(processes)}')
+            process.start()
+            processes.append(process)
+        if PAYMENT_RECONCILER_ENABLED and (reconciler is None or not reconciler.is_alive()):
+            reconciler = multiprocessing.Process(target=reconciler_main, name='payments')
+            reconciler.start()
+        # Partition maintenance runs in a short-lived child so the supervisor
+        # never holds database connections across forks
+        if time.monotonic() >= next_maintenance and (maintenance is None or not maintenance.is_alive()):
+            maintenance = multiprocessing.Process(target=run_maintenance, name='maintenance')
+            maintenance.start()
+            next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+        stopping.wait(1)
+
+    processes.extend(p for p in (reconciler, maintenance) if p is not None and p.is_alive())
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,481 @@
+import os
+import json
+import time
+import socket
+import ipaddress
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from urllib.parse import urlsplit, urljoin
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from tool_catalog import catalog, CatalogError
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on concurrently running nodes per process, shared by all runs
+MAX_WORKERS = int(os.environ.get('WORKFLOW_MAX_WORKERS', 8))
+HTTP_NODE_TIMEOUT = float(os.environ.get('WORKFLOW_HTTP_TIMEOUT', 10))
+HTTP_NODE_MAX_REDIRECTS = int(os.environ.get('WORKFLOW_HTTP_MAX_REDIRECTS', 5))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+class WorkflowGraphError(Exception):
+    """Raised when the stored nodes/connections do not form a valid DAG"""
+
+class NodeExecutionError(Exception):
+    """Raised when a single node fails during a run"""
+    def __init__(self, node_id, message):
+        super().__init__(f"Node {node_id} failed: {message}")
+        self.node_id = node_id
+
+def _get_executor():
+    """Return the process-wide node executor, re-created after a fork"""
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='wf-node')
+                _executor_pid = pid
+    return _executor
+
+# Graph construction
+def _edge(conn):
+    """Return (upstream_id, downstream_id) for a connection from js1.js
+
+    Connections can be drawn from either end, so a connection that starts on
+    an input point and ends on an output point flows from target to source.
+    """
+    source_id = conn.get('sourceId')
+    target_id = conn.get('targetId')
+    if conn.get('sourceType') == 'input' and conn.get('targetType') == 'output':
+        return target_id, source_id
+    return source_id, target_id
+
+def _valid_id(value):
+    return isinstance(value, (str, int)) and not isinstance(value, bool) and value != ''
+
+def build_dag(nodes, connections):
+    """Build node map and adjacency lists from stored workflow JSON"""
+    if not isinstance(nodes or [], list) or not isinstance(connections or [], list):
+        raise WorkflowGraphError('Nodes and connections must be lists')
+    node_map = {}
+    for node in nodes or []:
+        if not isinstance(node, dict):
+            raise WorkflowGraphError('Nodes must be objects')
+        node_id = node.get('id')
+        if node_id is None or node_id == '':
+            raise WorkflowGraphError('Node without an id')
+        if not _valid_id(node_id):
+            raise WorkflowGraphError(f'Node id must be a string or integer: {node_id!r}')
+        if not isinstance(node.get('type'), (str, type(None))):
+            raise WorkflowGraphError(f'Node {node_id} has an invalid type')
+        if node_id in node_map:
+            raise WorkflowGraphError(f'Duplicate node id: {node_id}')
+        node_map[node_id] = node
+
+    upstream = {node_id: [] for node_id in node_map}
+    downstream = {node_id: [] for node_id in node_map}
+    for conn in connections or []:
+        if not isinstance(conn, dict):
+            raise WorkflowGraphError('Connections must be objects')
+        parent, child = _edge(conn)
+        if not _valid_id(parent) or not _valid_id(child) or parent not in node_map or child not in node_map:
+            raise WorkflowGraphError(f"Connection {conn.get('id')} references an unknown node")
+        if parent == child:
+            raise WorkflowGraphError(f'Node {parent} is connected to itself')
+        if child not in downstream[parent]:
+            downstream[parent].append(child)
+            upstream[child].append(parent)
+
+    return node_map, upstream, downstream
+
+def topological_levels(upstream, downstream):
+    """Group node ids into levels; every node only depends on earlier levels"""
+    indegree = {node_id: len(parents) for node_id, parents in upstream.items()}
+    level = [node_id for node_id, degree in indegree.items() if degree == 0]
+    levels = []
+    seen = 0
+    while level:
+        levels.append(level)
+        seen += len(level)
+        next_level = []
+        for node_id in level:
+            for child in downstream[node_id]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    next_level.append(child)
+        level = next_level
+
+    if seen != len(indegree):
+        cyclic = sorted((node_id for node_id, degree in indegree.items() if degree > 0), key=str)
+        raise WorkflowGraphError(f"Workflow contains a cycle involving nodes: {', '.join(map(str, cyclic))}")
+    return levels
+
+# Execution plans
+# Saving a workflow compiles its graph into a plan that runs load directly.
+# Nodes are stored in topological order and referenced by index; parents and
+# children use CSR-style offset arrays: the parents of node i are
+# parents[parent_offsets[i]:parent_offsets[i + 1]].
+PLAN_VERSION = 1
+TRIGGER_TYPES = catalog.trigger_types()
+
+# Settings a node of each type falls back to when its config leaves them out
+NODE_DEFAULTS = catalog.defaults()
+
+# Node keys that only affect the editor canvas, not execution
+LAYOUT_KEYS = frozenset(('x', 'y', 'title', 'icon', 'category'))
+
+def _resolve_config(node):
+    config = node.get('config') or {}
+    if not isinstance(config, dict):
+        raise WorkflowGraphError(f"Node {node['id']} has an invalid config")
+    resolved = dict(NODE_DEFAULTS.get(node.get('type'), {}))
+    resolved.update(config)
+    if node.get('type') == 'if' and (not isinstance(resolved['operator'], str) or resolved['operator'] not in _CONDITIONS):
+        raise WorkflowGraphError(f"Node {node['id']} uses unknown condition operator: {resolved['operator']}")
+    return resolved
+
+def _compact(order, index, adjacency):
+    offsets, flat = [0], []
+    for node_id in order:
+        flat.extend(sorted(index[other] for other in adjacency[node_id]))
+        offsets.append(len(flat))
+    return offsets, flat
+
+def compile_plan(nodes, connections):
+    """Validate a workflow graph and compile it into an execution plan
+
+    Raises WorkflowGraphError for dangling connections, cycles and non-empty
+    workflows without a trigger node.
+    """
+    node_map, upstream, downstream = build_dag(nodes, connections)
+    levels = topological_levels(upstream, downstream)
+    if node_map and not any(node.get('type') in TRIGGER_TYPES for node in node_map.values()):
+        raise WorkflowGraphError(f"Workflow needs a trigger node ({', '.join(TRIGGER_TYPES)})")
+
+    order = [node_id for level in levels for node_id in level]
+    index = {node_id: i for i, node_id in enumerate(order)}
+    parent_offsets, parents = _compact(order, index, upstream)
+    child_offsets, children = _compact(order, index, downstream)
+    return {
+        'version': PLAN_VERSION,
+        'nodes': [
+            {'id': node_id, 'type': node_map[node_id].get('type'), 'config': _resolve_config(node_map[node_id])}
+            for node_id in order
+        ],
+        'levels': [[index[node_id] for node_id in level] for level in levels],
+        'parent_offsets': parent_offsets,
+        'parents': parents,
+        'child_offsets': child_offsets,
+        'children': children
+    }
+
+def is_current_plan(plan):
+    return isinstance(plan, dict) and plan.get('version') == PLAN_VERSION
+
+def affects_plan(node_changes):
+    """Whether changing these node keys requires recompiling the plan"""
+    return not LAYOUT_KEYS.issuperset(node_changes)
+
+# Node handlers
+def _passthrough(node, data):
+    return data
+
+def _set_node(node, data):
+    """Merge configured values into the incoming data"""
+    result = dict(data) if isinstance(data, dict) else {'value': data}
+    result.update(node.get('config', {}).get('values', {}))
+    return result
+
+_CONDITIONS = {
+    'equals': lambda left, right: left == right,
+    'not_equals': lambda left, right: left != right,
+    'contains': lambda left, right: right in left if left is not None else False,
+    'greater_than': lambda left, right: left is not None and float(left) > float(right),
+    'less_than': lambda left, right: left is not None and float(left) < float(right),
+    'exists': lambda left, right: left is not None
+}
+
+def _if_node(node, data):
+    """Evaluate a field condition; a false result stops downstream nodes"""
+    config = node.get('config', {})
+    operator = config.get('operator', 'exists')
+    if operator not in _CONDITIONS:
+        raise ValueError(f'Unknown condition operator: {operator}')
+    left = data.get(config.get('field')) if isinstance(data, dict) else None
+    return {'condition': bool(_CONDITIONS[operator](left, config.get('value'))), 'data': data}
+
+def _check_url(url):
+    """Refuse URLs that are not http(s) or that resolve to non-public addresses
+
+    Node URLs are user-supplied and requested from inside our network, so
+    loopback, private, link-local (cloud metadata) and reserved ranges are off
+    limits. Returns the vetted address the request must connect to.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ValueError(f'Only http and https URLs are allowed: {url}')
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    try:
+        addresses = socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise ValueError(f'Cannot resolve {parts.hostname}: {e}')
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split('%', 1)[0])
+        if getattr(address, 'ipv4_mapped', None):
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f'Requests to {parts.hostname} ({address}) are not allowed')
+    return addresses[0][4][0].split('%', 1)[0]
+
+class _PinnedConnectionMixin:
+    """Connection that opens its socket to a fixed address
+
+    urllib3 still uses the URL's host for the Host header, SNI and certificate
+    verification; only the address it connects to is replaced, so a second
+    DNS lookup cannot swap in an address _check_url never saw.
+    """
+    pinned_address = None
+
+    def _new_conn(self):
+        host = self._dns_host
+        self._dns_host = self.pinned_address
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = host
+
+class _PinnedHTTPConnection(_PinnedConnectionMixin, HTTPConnection):
+    pass
+
+class _PinnedHTTPSConnection(_PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+class _PinnedPoolMixin:
+    def __init__(self, *args, pinned_address, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pinned_address = pinned_address
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.pinned_address = self.pinned_address
+        return conn
+
+class _PinnedHTTPConnectionPool(_PinnedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = _PinnedHTTPConnection
+
+class _PinnedHTTPSConnectionPool(_PinnedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _PinnedHTTPSConnection
+
+class _PinnedAdapter(HTTPAdapter):
+    """Transport adapter for a single hop, connecting to the vetted address"""
+    def __init__(self, address):
+        self.address = address
+        super().__init__()
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': partial(_PinnedHTTPConnectionPool, pinned_address=self.address),
+            'https': partial(_PinnedHTTPSConnectionPool, pinned_address=self.address)
+        }
+
+# Dropped when a redirect leaves the original origin, as requests does for
+# Authorization
+_SENSITIVE_HEADERS = ('authorization', 'proxy-authorization', 'cookie')
+
+def _origin(url):
+    parts = urlsplit(url)
+    return parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+
+def _send_pinned(method, url, address, **kwargs):
+    with requests.Session() as session:
+        # Proxies would connect somewhere other than the pinned address
+        session.trust_env = False
+        adapter = _PinnedAdapter(address)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session.request(method, url, allow_redirects=False, timeout=HTTP_NODE_TIMEOUT, **kwargs)
+
+def _outbound_request(method, url, **kwargs):
+    """requests.request with every hop, including redirects, passed through _check_url
+
+    Each hop connects to the address _check_url vetted rather than resolving
+    the host again.
+    """
+    for _ in range(HTTP_NODE_MAX_REDIRECTS + 1):
+        address = _check_url(url)
+        response = _send_pinned(method, url, address, **kwargs)
+        if not response.is_redirect:
+            return response
+        next_url = urljoin(url, response.headers['location'])
+        if _origin(next_url) != _origin(url) and kwargs.get('headers'):
+            kwargs['headers'] = {
+                name: value for name, value in kwargs['headers'].items()
+                if name.lower() not in _SENSITIVE_HEADERS
+            }
+        url = next_url
+        if response.status_code in (301, 302, 303) and method != 'HEAD':
+            # Browsers and requests switch to GET without a body here
+            method = 'GET'
+            kwargs.pop('json', None)
+    raise ValueError(f'More than {HTTP_NODE_MAX_REDIRECTS} redirects')
+
+def _http_node(node, data):
+    """Call an external HTTP endpoint with the incoming data as JSON body"""
+    config = node.get('config', {})
+    url = config.get('url')
+    if not url:
+        raise ValueError('HTTP node requires a url')
+    method = config.get('method', 'POST').upper()
+    response = _outbound_request(
+        method, url,
+        json=data if method != 'GET' else None,
+        headers=config.get('headers', {})
+    )
+    try:
+        body = response.json()
+    except ValueError:
+        body = response.text
+    return {'status_code': response.status_code, 'body': body}
+
+def _slack_node(node, data):
+    """Post a message to a Slack incoming-webhook URL"""
+    config = node.get('config', {})
+    webhook_url = config.get('webhook_url')
+    if not webhook_url:
+        return _not_configured(node, data)
+    text = config.get('message', '{data}').replace('{data}', json.dumps(data, default=str))
+    response = _outbound_request('POST', webhook_url, json={'text': text})
+    response.raise_for_status()
+    return {'sent': True, 'data': data}
+
+def _not_configured(node, data):
+    """Integrations without a server-side implementation pass data through"""
+    return {'skipped': True, 'reason': f"'{node.get('type')}' nodes are not executed server-side", 'data': data}
+
+# Handlers the catalog may name; types without one fall back to _not_configured
+_HANDLERS_BY_NAME = {
+    'passthrough': _passthrough,
+    'set': _set_node,
+    'if': _if_node,
+    'http': _http_node,
+    'slack': _slack_node
+}
+
+def _bind_handlers(handler_names):
+    unknown = sorted(set(handler_names.values()) - set(_HANDLERS_BY_NAME))
+    if unknown:
+        raise CatalogError(f"Tool catalog names unknown node handlers: {', '.join(unknown)}")
+    return {node_type: _HANDLERS_BY_NAME[name] for node_type, name in handler_names.items()}
+
+NODE_HANDLERS = _bind_handlers(catalog.handler_names())
+
+def _run_node(node, data):
+    """Run one node and return (output, wall time in ms)"""
+    handler = NODE_HANDLERS.get(node.get('type'), _not_configured)
+    started = time.perf_counter()
+    try:
+        output = handler(node, data)
+    except Exception as e:
+        raise NodeExecutionError(node.get('id'), str(e)) from e
+    return output, round((time.perf_counter() - started) * 1000, 3)
+
+def _forwarded(node, output):
+    """The data a node hands to its children; IF nodes pass their input on"""
+    if node.get('type') == 'if':
+        return output.get('data')
+    return output
+
+def _node_input(parents, outputs, input_data):
+    """Root nodes receive the run input; others receive their parents' output"""
+    if not parents:
+        return input_data
+    if len(parents) == 1:
+        return _forwarded(parents[0], outputs[parents[0]['id']])
+    merged = {}
+    for parent in parents:
+        value = _forwarded(parent, outputs[parent['id']])
+        merged.update(value if isinstance(value, dict) else {parent['id']: value})
+    return merged
+
+def _passes(node, output):
+    """Whether a finished node lets execution continue to its children"""
+    return not (node.get('type') == 'if' and not output.get('condition'))
+
+def run_plan(plan, input_data=None):
+    """Execute a compiled plan and return a results document
+
+    Nodes are submitted as soon as all of their parents have finished, so
+    independent branches run concurrently on the shared thread pool. A node
+    runs when at least one parent passed; nodes behind a false IF branch are
+    reported as skipped.
+    """
+    plan_nodes = plan['nodes']
+    parent_offsets, parents = plan['parent_offsets'], plan['parents']
+    child_offsets, children = plan['child_offsets'], plan['children']
+
+    executor = _get_executor()
+    input_data = input_data or {}
+    outputs = {}
+    timings = {}
+    skipped = []
+    passed = set()
+    remaining = [parent_offsets[i + 1] - parent_offsets[i] for i in range(len(plan_nodes))]
+    running = {}
+    started = time.perf_counter()
+
+    def settle(i):
+        """Schedule or skip children whose parents have all settled"""
+        for child in children[child_offsets[i]:child_offsets[i + 1]]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                submit(child)
+
+    def submit(i):
+        node_parents = parents[parent_offsets[i]:parent_offsets[i + 1]]
+        live_parents = [plan_nodes[p] for p in node_parents if p in passed]
+        if node_parents and not live_parents:
+            skipped.append(plan_nodes[i]['id'])
+            settle(i)
+            return
+        data = _node_input(live_parents, outputs, input_data)
+        running[executor.submit(_run_node, plan_nodes[i], data)] = i
+
+    for i in plan['levels'][0] if plan['levels'] else []:
+        submit(i)
+
+    try:
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                node = plan_nodes[i]
+                output, elapsed_ms = future.result()
+                outputs[node['id']] = output
+                timings[node['id']] = elapsed_ms
+                if _passes(node, output):
+                    passed.add(i)
+                settle(i)
+    except NodeExecutionError:
+        for future in running:
+            future.cancel()
+        raise
+
+    return {
+        'outputs': outputs,
+        'node_timings_ms': timings,
+        'skipped_nodes': skipped,
+        'total_time_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+def run_workflow(nodes, connections, input_data=None):
+    """Compile and execute raw workflow JSON, for workflows saved without a plan"""
+    return run_plan(compile_plan(nodes, connections), input_data)
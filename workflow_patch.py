@@ -0,0 +1,158 @@
+import json
+
+# Partial workflow updates. Editor operations are addressed by node or
+# connection id and compiled into a single UPDATE whose SET expressions
+# rewrite the JSONB arrays inside Postgres, so a dragged node sends a few
+# bytes instead of re-serialising the whole workflow. Postgres still writes a
+# new version of the row, but the request and response payloads stay small.
+
+class PatchError(ValueError):
+    """Raised for malformed operations or operations on unknown ids"""
+
+SCALAR_FIELDS = ('name', 'description', 'status')
+MAX_OPERATIONS = 500
+
+# Each helper wraps an array expression and its bound parameters in another
+# expression, keeping the parameters in placeholder order.
+
+def _map_array(expr, params, match_sql, match_params, value_sql, value_params):
+    """Rebuild a JSONB array, transforming the elements that match"""
+    sql = (
+        f"(SELECT COALESCE(jsonb_agg(CASE WHEN {match_sql} THEN {value_sql} ELSE v END ORDER BY i), '[]'::jsonb) "
+        f"FROM jsonb_array_elements({expr}) WITH ORDINALITY AS t(v, i))"
+    )
+    return sql, match_params + value_params + params
+
+def _filter_array(expr, params, keep_sql, keep_params):
+    """Rebuild a JSONB array keeping only the elements matching keep_sql"""
+    sql = (
+        f"(SELECT COALESCE(jsonb_agg(v ORDER BY i), '[]'::jsonb) "
+        f"FROM jsonb_array_elements({expr}) WITH ORDINALITY AS t(v, i) WHERE {keep_sql})"
+    )
+    return sql, params + keep_params
+
+def _append_array(expr, params, element):
+    return f"({expr} || jsonb_build_array(%s::jsonb))", params + [json.dumps(element)]
+
+def _require(op, key, kind=None):
+    if key not in op:
+        raise PatchError(f"Operation '{op.get('op')}' requires '{key}'")
+    value = op[key]
+    if kind is not None and not isinstance(value, kind):
+        raise PatchError(f"'{key}' in operation '{op.get('op')}' has the wrong type")
+    return value
+
+def build_patch(operations, node_ids, connection_ends):
+    """Compile operations into SET clauses for one UPDATE statement
+
+    node_ids are the stored node ids and connection_ends maps each stored
+    connection id to its (sourceId, targetId); both are used to reject
+    operations on unknown elements. Returns (set_clauses, params, changes)
+    where changes summarises what the caller should report back.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise PatchError('operations must be a non-empty list')
+    if len(operations) > MAX_OPERATIONS:
+        raise PatchError(f'At most {MAX_OPERATIONS} operations per request')
+
+    node_ids = set(node_ids)
+    connection_ends = {c: tuple(ends) for c, ends in connection_ends.items()}
+    connection_ids = set(connection_ends)
+    # Older rows may hold NULL arrays
+    nodes_expr, nodes_params = "COALESCE(nodes, '[]'::jsonb)", []
+    connections_expr, connections_params = "COALESCE(connections, '[]'::jsonb)", []
+    fields = {}
+    changes = {'nodes': [], 'removed_nodes': [], 'connections': [], 'removed_connections': [], 'fields': []}
+
+    for op in operations:
+        if not isinstance(op, dict):
+            raise PatchError('Each operation must be an object')
+        kind = op.get('op')
+
+        if kind == 'update_node':
+            node_id = _require(op, 'id', str)
+            node_changes = _require(op, 'changes', dict)
+            if node_id not in node_ids:
+                raise PatchError(f'Unknown node: {node_id}')
+            if 'id' in node_changes:
+                raise PatchError('Node ids cannot be changed')
+            nodes_expr, nodes_params = _map_array(
+                nodes_expr, nodes_params, "v->>'id' = %s", [node_id], "v || %s::jsonb", [json.dumps(node_changes)]
+            )
+            changes['nodes'].append(node_id)
+
+        elif kind == 'add_node':
+            node = _require(op, 'node', dict)
+            node_id = node.get('id')
+            if not isinstance(node_id, str) or node_id in node_ids:
+                raise PatchError('add_node requires a node with a new string id')
+            nodes_expr, nodes_params = _append_array(nodes_expr, nodes_params, node)
+            node_ids.add(node_id)
+            changes['nodes'].append(node_id)
+
+        elif kind == 'remove_node':
+            node_id = _require(op, 'id', str)
+            if node_id not in node_ids:
+                raise PatchError(f'Unknown node: {node_id}')
+            nodes_expr, nodes_params = _filter_array(
+                nodes_expr, nodes_params, "v->>'id' IS DISTINCT FROM %s", [node_id]
+            )
+            # Connections touching the node go with it
+            connections_expr, connections_params = _filter_array(
+                connections_expr, connections_params,
+                "v->>'sourceId' IS DISTINCT FROM %s AND v->>'targetId' IS DISTINCT FROM %s", [node_id, node_id]
+            )
+            attached = [c for c in connection_ids if node_id in connection_ends[c]]
+            connection_ids.difference_update(attached)
+            changes['removed_connections'].extend(attached)
+            node_ids.discard(node_id)
+            changes['removed_nodes'].append(node_id)
+
+        elif kind == 'add_connection':
+            connection = _require(op, 'connection', dict)
+            connection_id = connection.get('id')
+            if not isinstance(connection_id, str) or connection_id in connection_ids:
+                raise PatchError('add_connection requires a connection with a new string id')
+            for end in ('sourceId', 'targetId'):
+                if connection.get(end) not in node_ids:
+                    raise PatchError(f"Connection {connection_id} {end} references an unknown node")
+            connections_expr, connections_params = _append_array(connections_expr, connections_params, connection)
+            connection_ends[connection_id] = (connection['sourceId'], connection['targetId'])
+            connection_ids.add(connection_id)
+            changes['connections'].append(connection_id)
+
+        elif kind == 'remove_connection':
+            connection_id = _require(op, 'id', str)
+            if connection_id not in connection_ids:
+                raise PatchError(f'Unknown connection: {connection_id}')
+            connections_expr, connections_params = _filter_array(
+                connections_expr, connections_params, "v->>'id' IS DISTINCT FROM %s", [connection_id]
+            )
+            connection_ids.discard(connection_id)
+            changes['removed_connections'].append(connection_id)
+
+        elif kind == 'set':
+            field = _require(op, 'field', str)
+            if field not in SCALAR_FIELDS:
+                raise PatchError(f'Field cannot be patched: {field}')
+            fields[field] = _require(op, 'value')
+            changes['fields'].append(field)
+
+        else:
+            raise PatchError(f'Unknown operation: {kind}')
+
+    set_clauses, params = [], []
+    for field, value in fields.items():
+        set_clauses.append(f"{field} = %s")
+        params.append(value)
+    if nodes_params:
+        set_clauses.append(f"nodes = {nodes_expr}")
+        params.extend(nodes_params)
+    if connections_params:
+        set_clauses.append(f"connections = {connections_expr}")
+        params.extend(connections_params)
+
+    # Elements both changed and later removed are only reported as removed
+    changes['nodes'] = [n for n in dict.fromkeys(changes['nodes']) if n in node_ids]
+    changes['connections'] = [c for c in dict.fromkeys(changes['connections']) if c in connection_ids]
+    return set_clauses, params, changes